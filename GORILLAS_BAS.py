@@ -3,16 +3,26 @@
 
 import pygame
 import math
-import random
 import sys
 import struct
 import numpy as np
 import time
 import threading
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from gorillas_core import (
+    CITY_BOTTOM, CRATER_RADIUS, GORILLA_SIZE, MAX_PLAYERS, MAX_POINTS, SCREEN_HEIGHT,
+    SCREEN_WIDTH, SHOT_DT, GorillasMatch,
+)
+from gorillas_projectiles import Volley
+from gorillas_world import CHUNK_WIDTH
+from gorillas_replay import Replay
+from gorillas_snapshot import AutoSaver, load_snapshot, restore_snapshot, take_snapshot
+from gorillas_stats import StatsLog
+from gorillas_timing import frame_timer
 
-# Set up for sounds
-pygame.mixer.pre_init(44100, -16, 1, 512)
-pygame.mixer.init()
 NOTE_TABLE = [
     0,   # N0 = rest
     65.41, 69.30, 73.42, 77.78, 82.41, 87.31,
@@ -27,6 +37,37 @@ NOTE_TABLE = [
 
 NOTE_OFFSET = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
 
+SOUND_CACHE_SIZE = 256
+TEXT_CACHE_SIZE = 64
+
+class BufferPool:
+    # Reusable surfaces, arrays and sounds keyed by what they hold. get() only calls the
+    # factory on a miss; those misses are counted so the frame overlay can show them.
+    # With max_items the least recently used entries are let go.
+    def __init__(self, max_items=None):
+        self.items = OrderedDict()
+        self.max_items = max_items
+        self.allocations = 0
+        self.lock = threading.Lock()  # PLAY threads share the sound pool
+
+    def get(self, key, factory):
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None:
+                if self.max_items is not None:
+                    self.items.move_to_end(key)
+                return item
+        item = factory()
+        with self.lock:
+            self.items[key] = item
+            self.allocations += 1
+            if self.max_items is not None and len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+        return item
+
+_sounds = BufferPool(SOUND_CACHE_SIZE)
+_audio_offset = 0.0  # seconds, see set_audio_offset
+
 def _read_number(s, i):
     n = ""
     while i < len(s) and s[i].isdigit():
@@ -34,110 +75,145 @@ def _read_number(s, i):
         i += 1
     return (int(n) if n else 0), i
 
-def _play_square(freq, duration, volume):
-    if freq <= 0:
-        time.sleep(duration)
-        return
-
-    sample_rate = 44100
+def set_audio_offset(ms):
+    # Delay sound effects by `ms` against the frames they belong to, for displays that
+    # lag behind the sound output. PLAY never blocks the game loop, so there is no
+    # negative offset: a sound that lags its frames wants a smaller mixer buffer instead
+    # (gorillas_audio.py measures each size).
+    if ms < 0:
+        raise ValueError("the audio offset cannot be negative")
+    global _audio_offset
+    _audio_offset = ms / 1000
+
+def _square_wave(freq, duration):
+    # Synthesize a square wave note as int16 samples shaped for the mixer
+    sample_rate, _, channels = pygame.mixer.get_init()
     n = max(1, int(sample_rate * duration))
     t = np.linspace(0, duration, n, False)
     wave = np.sign(np.sin(2 * np.pi * freq * t))
     audio = (wave * 32767).astype(np.int16)
 
     # Match mixer channels
-    channels = pygame.mixer.get_init()[2]
-    if channels == 2:
-        audio = np.column_stack((audio, audio))
+    if channels > 1:
+        audio = np.repeat(audio[:, None], channels, axis=1)
+    return audio
 
-    snd = pygame.sndarray.make_sound(audio)
-    snd.set_volume(volume)
-    snd.play()
+def _play_square(freq, duration, volume, started=None):
+    # started: optional threading.Event set once the note is handed to the mixer
+    if freq <= 0:
+        if started is not None:
+            started.set()
+        time.sleep(duration)
+        return
+
+    # The game only ever plays a few dozen distinct notes, so each Sound is built once.
+    # Sounds are shared between PLAY threads: volume and stop go through our own channel.
+    with frame_timer.stage('audio'):
+        snd = _sounds.get((freq, duration, pygame.mixer.get_init()),
+                          lambda: pygame.sndarray.make_sound(_square_wave(freq, duration)))
+        channel = snd.play()
+        if channel is not None:
+            channel.set_volume(volume)
+    if started is not None:
+        started.set()
     time.sleep(duration)
-    snd.stop()
+    if channel is not None and channel.get_sound() is snd:
+        channel.stop()
 
-def PLAY(play_string, volume=0.4):
+def parse_play(play_string):
+    # Turn a QBasic PLAY string into a list of (frequency, seconds); frequency 0 is a rest
     s = play_string.upper()
-    background = s.startswith("MB")
-
-    def player():
-        octave = 4
-        length = 4
-        tempo = 120
-        staccato = False
-        i = 0
-        while i < len(s):
-            ch = s[i]
-            # MODE
-            if ch == 'M' and i + 1 < len(s):
-                i += 2
-                continue
-            # TEMPO
-            if ch == 'T':
-                tempo, i = _read_number(s, i + 1)
-                continue
-            # OCTAVE
-            if ch == 'O':
-                octave, i = _read_number(s, i + 1)
-                continue
-            if ch == '>':
-                octave += 1
-                i += 1
-                continue
-            if ch == '<':
-                octave -= 1
+    notes = []
+    octave = 4
+    length = 4
+    tempo = 120
+    i = 0
+    while i < len(s):
+        ch = s[i]
+        # MODE
+        if ch == 'M' and i + 1 < len(s):
+            i += 2
+            continue
+        # TEMPO
+        if ch == 'T':
+            tempo, i = _read_number(s, i + 1)
+            continue
+        # OCTAVE
+        if ch == 'O':
+            octave, i = _read_number(s, i + 1)
+            continue
+        if ch == '>':
+            octave += 1
+            i += 1
+            continue
+        if ch == '<':
+            octave -= 1
+            i += 1
+            continue
+        # LENGTH
+        if ch == 'L':
+            length, i = _read_number(s, i + 1)
+            length = max(1, length)
+            continue
+        # PAUSE
+        if ch == 'P':
+            notes.append((0, 60 / tempo * (4 / length)))
+            i += 1
+            continue
+        # NOTE NUMBER (N)
+        if ch == 'N':
+            note, i = _read_number(s, i + 1)
+            freq = NOTE_TABLE[note] if note < len(NOTE_TABLE) else 0
+            notes.append((freq, 60 / tempo * (4 / length)))
+            continue
+        # LETTER NOTE
+        if ch in NOTE_OFFSET:
+            semi = NOTE_OFFSET[ch]
+            i += 1
+            if i < len(s) and s[i] in '+#':
+                semi += 1
                 i += 1
-                continue
-            # LENGTH
-            if ch == 'L':
-                length, i = _read_number(s, i + 1)
-                length = max(1, length)
-                continue
-            # PAUSE
-            if ch == 'P':
-                dur = 60 / tempo * (4 / length)
-                time.sleep(dur)
+            elif i < len(s) and s[i] == '-':
+                semi -= 1
                 i += 1
-                continue
-            # NOTE NUMBER (N)
-            if ch == 'N':
-                note, i = _read_number(s, i + 1)
-                freq = NOTE_TABLE[note] if note < len(NOTE_TABLE) else 0
-                dur = 60 / tempo * (4 / length)
-                _play_square(freq, dur, volume)
-                continue
-            # LETTER NOTE
-            if ch in NOTE_OFFSET:
-                semi = NOTE_OFFSET[ch]
+            note_num = octave * 12 + semi + 1
+            freq = NOTE_TABLE[note_num] if note_num < len(NOTE_TABLE) else 0
+            dur = 60 / tempo * (4 / length)
+            if i < len(s) and s[i] == '.':
+                dur *= 1.5
                 i += 1
-                if i < len(s) and s[i] in '+#':
-                    semi += 1
-                    i += 1
-                elif i < len(s) and s[i] == '-':
-                    semi -= 1
-                    i += 1
-                note_num = octave * 12 + semi + 1
-                freq = NOTE_TABLE[note_num] if note_num < len(NOTE_TABLE) else 0
-                dur = 60 / tempo * (4 / length)
-                if i < len(s) and s[i] == '.':
-                    dur *= 1.5
-                    i += 1
-                _play_square(freq, dur, volume)
-                continue
+            notes.append((freq, dur))
+            continue
 
-            i += 1
+        i += 1
+    return notes
+
+def PLAY(play_string, volume=0.4, started=None):
+    # started: optional threading.Event set when the first note reaches the mixer
+    notes = parse_play(play_string)
+    background = play_string.upper().startswith("MB")
+    offset = _audio_offset
+
+    def player():
+        if background and offset > 0:
+            time.sleep(offset)
+        for i, (freq, dur) in enumerate(notes):
+            _play_square(freq, dur, volume, started if i == 0 else None)
 
     if background:
         threading.Thread(target=player, daemon=True).start()
     else:
         player()
 
-# Constants from GORILLAS.BAS
-SCREEN_WIDTH = 640
-SCREEN_HEIGHT = 350
+# Constants from GORILLAS.BAS (screen size and city layout live in gorillas_core)
 SCALE = 2  # Window scaling for modern displays
 FPS = 60
-CITY_BOTTOM = 15
+
+# Default mixer setup; smaller buffers mean less delay until a sound is heard but underrun
+# on slow machines (python gorillas_audio.py measures each size)
+AUDIO_RATE = 44100
+AUDIO_BUFFER = 512
+AUDIO_CHANNELS = 1
 
 # EGA 16-color palette
 EGA_PALETTE = [
@@ -162,9 +238,10 @@ EGA_PALETTE = [
 # Color constants
 BACKATTR = 1  # Blue background
 OBJECTCOLOR = 6  # Brown for gorillas
-WINDOWCOLOR = 14  # Yellow windows
 SUNATTR = 14  # Yellow
 EXPLOSION_COLOR = 4  # Red explosion
+BLAST_FRAMES = 5  # frames a cluster fragment's landing ring grows (then as many to shrink)
+DEBRIS_ROWS_PER_FRAME = 12  # how far crumbling debris falls per frame of its animation
 
 # Banana DATA from EGABanana section
 BANANA_LEFT = [458758, 202116096, 471604224, 943208448, 943208448, 943208448, 471604224, 202116096, 0]
@@ -172,8 +249,47 @@ BANANA_DOWN = [262153, -2134835200, -2134802239, -2130771968, -2130738945, 83230
 BANANA_UP = [262153, 4063232, 4063294, 8323072, 8323199, -2130771968, -2130738945, -2134835200, -2134802239]
 BANANA_RIGHT = [458758, -1061109760, -522133504, 1886416896, 1886416896, 1886416896, -522133504, -1061109760, 0]
 
-class QBasicGorillas:
-    def __init__(self):
+EGA_RGB = np.array(EGA_PALETTE, dtype=np.uint8)
+
+# Aiming aid: how many flight steps of the predicted path to compute per input frame,
+# and how many typed (angle, velocity) paths to keep
+PREVIEW_STEPS_PER_FRAME = 40
+PREVIEW_CACHE_SIZE = 32
+
+
+class TrajectoryPreview:
+    # Predicted banana path for one typed angle/velocity. The flight is pulled from a
+    # trace_shot generator a few steps at a time, so it is only computed as far as the
+    # frames drawing it have needed.
+    def __init__(self, steps):
+        self.steps = steps
+        self.points = []
+        self.done = False
+
+    def extend(self, budget):
+        while budget > 0 and not self.done:
+            step = next(self.steps, None)
+            if step is None:
+                self.done = True
+                break
+            t, x, y, coll_type, coll_data = step
+            self.points.append((int(x), int(y)))
+            # The sun doesn't stop a banana
+            if coll_type in ('building', 'gorilla'):
+                self.done = True
+            budget -= 1
+
+
+class QBasicGorillas(GorillasMatch):
+    # Pygame frontend: window, input screens, drawing and sound on top of the game rules
+    def __init__(self, seed=None, num_players=2, audio=None):
+        # audio: (sample rate, buffer size in samples, channels) of the mixer
+        super().__init__(seed, num_players)
+
+        # Set up for sounds
+        rate, buffer, channels = audio or (AUDIO_RATE, AUDIO_BUFFER, AUDIO_CHANNELS)
+        pygame.mixer.pre_init(rate, -16, channels, buffer)
+        pygame.mixer.init()
         pygame.init()
         self.display = pygame.display.set_mode((SCREEN_WIDTH * SCALE, SCREEN_HEIGHT * SCALE))
         pygame.display.set_caption("QBasic Gorillas")
@@ -183,25 +299,32 @@ class QBasicGorillas:
         self.player_font = pygame.font.SysFont("couriernew", 18, bold=True)
         self.small_font = pygame.font.SysFont("couriernew", 16, bold=True)
         
-        # Game state
-        self.player1_name = ""
-        self.player2_name = ""
-        self.num_games = 3
-        self.gravity = 9.8
-        self.buildings = []
+        # Frontend state
         self.city_surf = None  # damageable city bitmap
-        self.gorilla_x = [0, 0]
-        self.gorilla_y = [0, 0]
-        self.wind = 0
-        self.scores = [0, 0]
-        self.sun_hit = False
-        self.gorilla_alive = [True, True]
+        self.city_page = 0  # which of the two pooled city surfaces is city_surf
+        self.round_worker = None  # thread that prepares the next round between rounds
+        self.chunk_surfs = {}  # wide battlefield: chunk -> (surface, world, version drawn)
+        self.camera_x = 0  # left edge of the view on a wide battlefield
+        self.show_preview = False  # draw the predicted path while typing a shot
+        self.previews = OrderedDict()
+        self.last_velocity = {}  # player -> velocity of their last throw
+        self.allow_cancel = True  # ESC stops a flying banana (network play only skips ahead)
+        self.autosaver = None  # gorillas_snapshot.AutoSaver when autosaving is on
+        self.stats = None  # gorillas_stats.StatsLog when --stats is on
+        self.shot_end = None  # (impact, flight time, x, y) of the last throw animated
+        self.timer = frame_timer  # per-stage frame timing, off unless enable_timing()
+        self.show_frame_stats = False
+        self.buffers = BufferPool()  # per-round surfaces and arrays, reused
+        self.texts = BufferPool(TEXT_CACHE_SIZE)  # rendered text, most of it repeats per frame
+        self.allocations_seen = 0
+        self.frame_allocations = 0
         
         # Load banana sprites
         self.banana_sprites = self.load_banana_sprites()
         
         # Gorilla sprite storage
         self.gorilla_images = self.create_gorilla_images()
+        self.gorilla_masks = self.create_gorilla_masks()
     
     def decode_put_array(self, data):
         # Decode QBasic SCREEN 9 PUT array format
@@ -349,11 +472,64 @@ class QBasicGorillas:
             'right': self.draw_gorilla(0, 0, 1)
         }
     
+    def create_gorilla_masks(self):
+        # Hit masks from the pre-rendered gorilla images: one flat bytes per pose with
+        # mask[dx * GORILLA_SIZE + dy] set where the sprite has a visible pixel
+        masks = {}
+        for pose, image in self.gorilla_images.items():
+            alpha = pygame.surfarray.array_alpha(image)
+            masks[pose] = (alpha > 0).astype(np.uint8).tobytes()
+        return masks
+    
     def center_text(self, text, y, color=7):
         # Center text on screen
-        surf = self.font.render(text, True, EGA_PALETTE[color])
-        x = (SCREEN_WIDTH - surf.get_width()) // 2
-        self.screen.blit(surf, (x, y))
+        with self.timer.stage('text'):
+            surf = self.render_text(self.font, text, color)
+            x = (SCREEN_WIDTH - surf.get_width()) // 2
+            self.screen.blit(surf, (x, y))
+
+    def render_text(self, font, text, color=7, background=None):
+        # Cached font.render: names, scores and prompts are redrawn every frame. All text
+        # goes through here so the frame overlay's allocation count sees it.
+        return self.texts.get(
+            (id(font), text, color, background),
+            lambda: font.render(text, True, EGA_PALETTE[color],
+                                None if background is None else EGA_PALETTE[background]))
+
+    def allocation_count(self):
+        # Pooled allocations so far (surfaces, arrays, text and sounds)
+        return self.buffers.allocations + self.texts.allocations + _sounds.allocations
+
+    def present(self):
+        # End of a frame: scale the 640x350 screen up to the window and show it
+        timer = self.timer
+        if self.show_frame_stats:
+            self.draw_frame_stats()
+        with timer.stage('scale'):
+            pygame.transform.scale(self.screen, self.display.get_size(), self.display)
+        with timer.stage('flip'):
+            pygame.display.flip()
+        allocations = self.allocation_count()
+        self.frame_allocations = allocations - self.allocations_seen
+        self.allocations_seen = allocations
+        timer.frame_end()
+
+    def enable_timing(self, overlay=False):
+        # Turn on per-stage timing (see gorillas_timing.py), optionally with the overlay.
+        # check_collision is called from the core's flight loop, so it is timed by wrapping.
+        self.timer.enable()
+        self.check_collision = self.timer.wrap('check_collision', self.check_collision)
+        self.show_frame_stats = overlay
+
+    def draw_frame_stats(self):
+        # Frame-time overlay in the top-left corner
+        y = 20
+        lines = self.timer.overlay_lines()
+        lines.append(f"allocations {self.frame_allocations:3d}  total {self.allocations_seen}")
+        for line in lines:
+            surf = self.render_text(self.font, line, 15, 0)
+            self.screen.blit(surf, (5, y))
+            y += surf.get_height()
     
     
     def draw_input_history(self):
@@ -372,14 +548,14 @@ class QBasicGorillas:
         # Top and bottom borders
         for i, x in enumerate(range(0, SCREEN_WIDTH, 8)):
             if (i + offset) % 5 == 0:
-                surf = self.small_font.render("*", True, EGA_PALETTE[4])
+                surf = self.render_text(self.small_font, "*", 4)
                 self.screen.blit(surf, (x, 5))
                 self.screen.blit(surf, (x, SCREEN_HEIGHT - 20))
         
         # Side borders
         for i, y in enumerate(range(20, SCREEN_HEIGHT - 20, 8)):
             if (i + offset) % 5 == 0:
-                surf = self.small_font.render("*", True, EGA_PALETTE[4])
+                surf = self.render_text(self.small_font, "*", 4)
                 self.screen.blit(surf, (5, y))
                 self.screen.blit(surf, (SCREEN_WIDTH - 15, y))
     
@@ -416,8 +592,7 @@ class QBasicGorillas:
             
             self.center_text("Press any key to continue", SCREEN_HEIGHT - 40, 7)
             
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
+            self.present()
             self.clock.tick(15)
             frame += 1
         
@@ -463,13 +638,13 @@ class QBasicGorillas:
             live = text  # do NOT show defaults while typing
             line = f"{prompt} {live}".rstrip()
 
-            line_surf = self.font.render(line, True, EGA_PALETTE[7])
+            line_surf = self.render_text(self.font, line, 7)
             x = (SCREEN_WIDTH - line_surf.get_width()) // 2
             self.screen.blit(line_surf, (x, y_pos))
 
             # Draw blinking cursor separately so centering never changes
             if cursor_visible:
-                cursor_surf = self.font.render("_", True, EGA_PALETTE[15])
+                cursor_surf = self.render_text(self.font, "_", 15)
                 self.screen.blit(cursor_surf, (x + line_surf.get_width(), y_pos))
 
             cursor_timer += 1
@@ -477,8 +652,7 @@ class QBasicGorillas:
                 cursor_visible = not cursor_visible
                 cursor_timer = 0
 
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
+            self.present()
             self.clock.tick(30)
 
     def get_inputs(self):
@@ -486,35 +660,35 @@ class QBasicGorillas:
         self.screen.fill(EGA_PALETTE[0])
         self.input_lines = []
         
-        result = self.get_input("Name of Player 1 (Default = 'Player 1'):", "Player 1", 80)
-        if result is None:
-            return False
-        self.player1_name = result[:10]
-        self.input_lines.append(("Name of Player 1 (Default = 'Player 1'):", self.player1_name, 80))
-        
-        result = self.get_input("Name of Player 2 (Default = 'Player 2'):", "Player 2", 110)
-        if result is None:
-            return False
-        self.player2_name = result[:10]
-        self.input_lines.append(("Name of Player 2 (Default = 'Player 2'):", self.player2_name, 110))
+        # Two players get the original spacing; a free-for-all packs the lines tighter
+        y, step = (80, 30) if self.num_players == 2 else (40, 16)
+        for i in range(self.num_players):
+            prompt = f"Name of Player {i + 1} (Default = 'Player {i + 1}'):"
+            result = self.get_input(prompt, f"Player {i + 1}", y)
+            if result is None:
+                return False
+            self.player_names[i] = result[:10]
+            self.input_lines.append((prompt, self.player_names[i], y))
+            y += step
         
-        result = self.get_input("Play to how many total points (Default = 3)?", "3", 140, True)
+        result = self.get_input("Play to how many total points (Default = 3)?", "3", y, True)
         if result is None:
             return False
         try:
-            self.num_games = max(1, int(result))
+            self.num_games = min(MAX_POINTS, max(1, int(result)))
         except:
             self.num_games = 3
-        self.input_lines.append(("Play to how many total points (Default = 3)?", str(self.num_games), 140))
+        self.input_lines.append(("Play to how many total points (Default = 3)?", str(self.num_games), y))
+        y += step
         
-        result = self.get_input("Gravity in Meters/Sec (Earth = 9.8)?", "9.8", 170, True)
+        result = self.get_input("Gravity in Meters/Sec (Earth = 9.8)?", "9.8", y, True)
         if result is None:
             return False
         try:
             self.gravity = float(result) if result else 9.8
         except:
             self.gravity = 9.8
-        self.input_lines.append(("Gravity in Meters/Sec (Earth = 9.8)", str(self.gravity), 170))
+        self.input_lines.append(("Gravity in Meters/Sec (Earth = 9.8)", str(self.gravity), y))
         
         return True
     
@@ -541,8 +715,7 @@ class QBasicGorillas:
             self.center_text("P = Play Game", 240, 7)
             self.center_text("Your Choice?", 270, 15)
             
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
+            self.present()
             self.clock.tick(30)
     
     def view_intro(self):
@@ -552,7 +725,7 @@ class QBasicGorillas:
             # Title and starring text
             self.center_text("Q B A S I C   G O R I L L A S", 30, 15)
             self.center_text("STARRING:", 80, 7)
-            player_text = f"{self.player1_name} AND {self.player2_name}"
+            player_text = f"{', '.join(self.player_names[:-1])} AND {self.player_names[-1]}"
             self.center_text(player_text, 110, 7)
             
             # Draw gorillas side by side in center
@@ -562,8 +735,7 @@ class QBasicGorillas:
             # Initial draw - both arms down
             self.screen.blit(self.gorilla_images['down'], (x, y))
             self.screen.blit(self.gorilla_images['down'], (x + 70, y))
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
+            self.present()
             pygame.time.wait(1000)
             
             # Animated sequence - 4 times
@@ -576,8 +748,7 @@ class QBasicGorillas:
                 
                 self.screen.blit(self.gorilla_images['left'], (x, y))
                 self.screen.blit(self.gorilla_images['right'], (x + 70, y))
-                self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-                pygame.display.flip()
+                self.present()
                 
                 PLAY("t120o1l16b9n0baan0bn0bn0baaan0b9n0baan0b")
                 pygame.time.wait(300)
@@ -590,8 +761,7 @@ class QBasicGorillas:
                 
                 self.screen.blit(self.gorilla_images['right'], (x, y))
                 self.screen.blit(self.gorilla_images['left'], (x + 70, y))
-                self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-                pygame.display.flip()
+                self.present()
                 
                 PLAY("o2l16e-9n0e-d-d-n0e-n0e-n0e-d-d-d-n0e-9n0e-d-d-n0e-")
                 pygame.time.wait(300)
@@ -610,143 +780,136 @@ class QBasicGorillas:
                     self.screen.blit(self.gorilla_images['right'], (x, y))
                     self.screen.blit(self.gorilla_images['left'], (x + 70, y))
                 
-                self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-                pygame.display.flip()
+                self.present()
                 PLAY("T160O0L32EFGEFDC")
                 pygame.time.wait(100)
             
             pygame.time.wait(1000)
     
-    def make_cityscape(self):
-        # Generate random cityscape
-        self.buildings = []
-        x = 2
-        slope = random.randint(1, 6)
-        
-        if slope == 1:
-            new_ht = 15
-        elif slope == 2:
-            new_ht = 130
-        elif slope <= 5:
-            new_ht = 15
-        else:
-            new_ht = 130
-        
-        while x < SCREEN_WIDTH - 10:
-            # Update height based on slope
-            if slope == 1:
-                new_ht += 10
-            elif slope == 2:
-                new_ht -= 10
-            elif slope <= 5:
-                if x > SCREEN_WIDTH // 2:
-                    new_ht -= 20
-                else:
-                    new_ht += 20
-            else:
-                if x > SCREEN_WIDTH // 2:
-                    new_ht += 20
-                else:
-                    new_ht -= 20
-            
-            width = random.randint(37, 74)
-            if x + width > SCREEN_WIDTH:
-                width = SCREEN_WIDTH - x - 2
-            
-            height = random.randint(0, 120) + new_ht
-            height = max(10, min(height, 200))
-            
-            color = random.choice([4, 5, 6, 7])
-            
-            bottom = SCREEN_HEIGHT - CITY_BOTTOM
-            top = bottom - height
-            windows = []
-            wx = x + 3
-            while wx < x + width - 3:
-                wy = top + 3
-                while wy < bottom - 3:
-                    win_color = WINDOWCOLOR if random.randint(1, 4) > 1 else 8
-                    windows.append((wx, wy, win_color))
-                    wy += 15
-                wx += 10
-
-            self.buildings.append({
-                'x': x,
-                'width': width,
-                'height': height,
-                'color': color,
-                'windows': windows
-            })
-            
-            x += width + 2
-        
-        # Set wind
-        self.wind = random.randint(-10, 10)
-        if random.randint(1, 3) == 1:
-            if self.wind > 0:
-                self.wind += random.randint(1, 10)
-            else:
-                self.wind -= random.randint(1, 10)
-        # Build damageable city bitmap for persistent building damage
-        self.rebuild_city_surface()
-
-    
     def draw_buildings(self):
         #Draw all buildings with windows
+        bottom = SCREEN_HEIGHT - CITY_BOTTOM
         for bldg in self.buildings:
-            bottom = SCREEN_HEIGHT - CITY_BOTTOM
-            top = bottom - bldg['height']
+            top = bottom - int(bldg['height'])
             
             # Draw building
             pygame.draw.rect(self.screen, EGA_PALETTE[bldg['color']],
-                           (bldg['x'], top, bldg['width'], bldg['height']))
+                           (int(bldg['x']), top, int(bldg['width']), int(bldg['height'])))
             
             # Draw windows
-            for (wx, wy, win_color) in bldg.get('windows', []):
-                pygame.draw.rect(self.screen, EGA_PALETTE[win_color], (wx, wy, 3, 6))
+            for c, r in zip(*np.nonzero(bldg['windows'])):
+                pygame.draw.rect(self.screen, EGA_PALETTE[bldg['windows'][c, r]],
+                                 (int(bldg['x']) + 3 + 10 * c, top + 3 + 15 * r, 3, 6))
 
 
-    def rebuild_city_surface(self):
+    def rebuild_city(self, prepared=None):
         # Render buildings onto a damageable transparent surface.
         #
         # This surface is blitted each frame instead of redrawing pristine building rectangles,
-        # so explosion holes remain visible and affect collision checks.
-        
-        self.city_surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-
-        for bldg in self.buildings:
-            bottom = SCREEN_HEIGHT - CITY_BOTTOM
-            top = bottom - bldg['height']
-
-            # Building body (opaque)
-            col = EGA_PALETTE[bldg['color']]
-            pygame.draw.rect(
-                self.city_surf,
-                (col[0], col[1], col[2], 255),
-                (bldg['x'], top, bldg['width'], bldg['height'])
-            )
-
-            # Windows (opaque) – skip bottom row
-            windows = bldg.get('windows', [])
-            if windows:
-                # Find the lowest row (largest y value)
-                max_wy = max(wy for (_, wy, _) in windows)
-
-                for (wx, wy, win_color) in windows:
-                    # Skip the bottom-most row
-                    if wy == max_wy:
-                        continue
-
-                    wcol = EGA_PALETTE[win_color]
-                    pygame.draw.rect(
-                        self.city_surf,
-                        (wcol[0], wcol[1], wcol[2], 255),
-                        (wx, wy, 3, 6)
-                    )
+        # so explosion holes remain visible. Its alpha always mirrors self.city_mask, which is
+        # what collision checks read.
+        # There are two such surfaces, allocated once: the one in play is repainted in place
+        # every round, and prepare_round paints the next city into the other one, which is
+        # swapped in here.
+        # A wide battlefield has no single surface: chunk_surface paints its chunks lazily.
+        pixels = super().rebuild_city(prepared)
+        if pixels is None:
+            return None
+        if prepared is not None and prepared.surface is not None:
+            self.city_page = 1 - self.city_page
+            self.city_surf = prepared.surface
+        else:
+            self.city_surf = self.city_surface(self.city_page)
+            self.paint_city(self.city_surf, pixels, self.city_mask)
+        return pixels
+
+    def city_surface(self, page):
+        return self.buffers.get(('city', page), lambda: pygame.Surface(
+            (SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA))
+
+    def prepare_round(self):
+        # The next round, with its city already painted into the spare surface
+        prepared = super().prepare_round()
+        if prepared.pixels is not None:
+            prepared.surface = self.city_surface(1 - self.city_page)
+            self.paint_city(prepared.surface, prepared.pixels, prepared.pixels != 0)
+        return prepared
+
+    def prepare_round_async(self):
+        # Start prepare_round on the worker thread; start_round(future.result()) swaps it in
+        if self.round_worker is None:
+            self.round_worker = ThreadPoolExecutor(1, thread_name_prefix="next-round")
+        return self.round_worker.submit(self.prepare_round)
+
+    def paint_city(self, surf, colors, mask, x0=0, x1=None):
+        # Copy columns x0..x1 of a city's colors and solid mask into a surface
+        pixels = pygame.surfarray.pixels3d(surf)
+        np.take(EGA_RGB, colors[x0:x1], axis=0, out=pixels[x0:x1], mode='clip')
+        del pixels
+        alpha = pygame.surfarray.pixels_alpha(surf)
+        np.copyto(alpha[x0:x1], mask[x0:x1])
+        alpha[x0:x1] *= 255
+        del alpha
+
+    def chunk_surface(self, index):
+        # Surface of one chunk of a wide battlefield, repainted whenever the chunk changed
+        world = self.world
+        colors, mask = world.chunk(index)
+        version = world.versions[index]
+        cached = self.chunk_surfs.get(index)
+        if cached is not None and cached[1] is world and cached[2] == version:
+            return cached[0]
+        surf = self.buffers.get(('chunk', index), lambda: pygame.Surface(
+            (CHUNK_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA))
+        self.paint_city(surf, colors, mask)
+        self.chunk_surfs[index] = (surf, world, version)
+        return surf
+
+    def follow(self, x):
+        # Point the camera at world x (only a wide battlefield scrolls)
+        if self.world_width > SCREEN_WIDTH:
+            self.camera_x = max(0, min(self.world_width - SCREEN_WIDTH,
+                                       int(x) - SCREEN_WIDTH // 2))
+        else:
+            self.camera_x = 0
+
+    def carve_city(self, x, y, radius=CRATER_RADIUS):
+        # Punch the explosion hole into the city bitmap as well as the mask
+        # (a wide battlefield's chunks notice the change themselves)
+        carved = super().carve_city(x, y, radius)
+        if carved is not None and self.world is None and self.city_surf is not None:
+            x0, x1, y0, y1, disc = carved
+            alpha = pygame.surfarray.pixels_alpha(self.city_surf)
+            alpha[x0:x1, y0:y1][disc] = 0
+            del alpha
+        return carved
+
+    def settle_debris(self, x0, x1, max_steps=None):
+        falling = super().settle_debris(x0, x1, max_steps)
+        if self.world is None and self.city_surf is not None:
+            self.paint_city(self.city_surf, self.city_pixels, self.city_mask, x0, x1)
+        return falling
+
+    def animate_debris(self, x0, x1):
+        # Let what an explosion undercut fall a few rows per frame until it has settled
+        falling = True
+        while falling:
+            with self.timer.stage('debris'):
+                falling = self.settle_debris(x0, x1, DEBRIS_ROWS_PER_FRAME)
+            self.draw_scene()
+            self.present()
+            with self.timer.stage('tick'):
+                self.clock.tick(FPS)
+
+    def load_city_state(self, buildings, damage, moved=b'', log=None):
+        destroyed = super().load_city_state(buildings, damage, moved, log)
+        if self.world is None:
+            self.paint_city(self.city_surf, self.city_pixels, self.city_mask)
+        return destroyed
  
     def draw_sun(self, shocked=False):
-        # Draw the sun
-        cx = SCREEN_WIDTH // 2
+        # Draw the sun (in the middle of the battlefield)
+        cx = self.world_width // 2 - self.camera_x
         cy = 40
         
         # Body
@@ -790,64 +953,122 @@ class QBasicGorillas:
             pygame.draw.line(self.screen, EGA_PALETTE[4],
                            (end_x, cy), (end_x + arrow_dir, cy + 2), 2)
     
-    def place_gorillas(self):
-        # Place gorillas on buildings
-        # Left gorilla on 2nd or 3rd building
-        left_idx = random.randint(1, 2)
-        left_bldg = self.buildings[left_idx]
-        self.gorilla_x[0] = left_bldg['x'] + left_bldg['width'] // 2 - 15
-        self.gorilla_y[0] = SCREEN_HEIGHT - CITY_BOTTOM - left_bldg['height'] - 30
-        
-        # Right gorilla on 2nd or 3rd from end
-        right_idx = len(self.buildings) - random.randint(2, 3)
-        right_bldg = self.buildings[right_idx]
-        self.gorilla_x[1] = right_bldg['x'] + right_bldg['width'] // 2 - 15
-        self.gorilla_y[1] = SCREEN_HEIGHT - CITY_BOTTOM - right_bldg['height'] - 30
-    
     def draw_scene(self):
         #Draw complete game scene
-        self.screen.fill(EGA_PALETTE[BACKATTR])
-        if self.city_surf is not None:
-            self.screen.blit(self.city_surf, (0, 0))
-        else:
-            self.draw_buildings()
-        self.draw_sun(self.sun_hit)
-        self.draw_wind_arrow()
-        
-        # Draw gorillas (skip ones that have been hit)
-        if self.gorilla_alive[0]:
-            self.screen.blit(self.gorilla_images['down'], (self.gorilla_x[0], self.gorilla_y[0]))
-        if self.gorilla_alive[1]:
-            self.screen.blit(self.gorilla_images['down'], (self.gorilla_x[1], self.gorilla_y[1]))
-
-        # Draw scores
-        score_text = f"{self.scores[0]} > Score < {self.scores[1]}"
-        self.center_text(score_text, SCREEN_HEIGHT - 30, 15)
+        with self.timer.stage('draw_scene'):
+            self.screen.fill(EGA_PALETTE[BACKATTR])
+            if self.world is not None:
+                # Only the chunks in view are drawn (and so ever rasterized)
+                cam = self.camera_x
+                last = min(self.world.num_chunks, (cam + SCREEN_WIDTH - 1) // CHUNK_WIDTH + 1)
+                self.screen.blits([(self.chunk_surface(index), (index * CHUNK_WIDTH - cam, 0))
+                                   for index in range(cam // CHUNK_WIDTH, last)],
+                                  doreturn=False)
+            elif self.city_surf is not None:
+                self.screen.blit(self.city_surf, (0, 0))
+            else:
+                self.draw_buildings()
+            self.draw_sun(self.sun_hit)
+            self.draw_wind_arrow()
+
+            # Draw gorillas (skip ones that have been hit)
+            for i in range(self.num_players):
+                if self.gorilla_alive[i]:
+                    self.screen.blit(self.gorilla_images[self.gorilla_pose[i]],
+                                     (self.gorilla_x[i] - self.camera_x, self.gorilla_y[i]))
+
+            # Draw scores
+            if self.num_players == 2:
+                score_text = f"{self.scores[0]} > Score < {self.scores[1]}"
+            else:
+                score_text = "Score " + " ".join(str(score) for score in self.scores)
+            self.center_text(score_text, SCREEN_HEIGHT - 30, 15)
+
+    def draw_names(self, font):
+        # Player names: in the top corners for two players, otherwise above each gorilla
+        # with the thrower's name highlighted
+        if self.num_players == 2:
+            name_surf = self.render_text(font, self.player1_name, 15)
+            self.screen.blit(name_surf, (5, 5))
+            name_surf = self.render_text(font, self.player2_name, 15)
+            self.screen.blit(name_surf, (SCREEN_WIDTH - name_surf.get_width() - 5, 5))
+            return
+        for i, name in enumerate(self.player_names):
+            if not self.gorilla_alive[i]:
+                continue
+            name_surf = self.render_text(font, name, 14 if i == self.current_player else 15)
+            x = (self.gorilla_x[i] - self.camera_x + GORILLA_SIZE // 2 -
+                 name_surf.get_width() // 2)
+            x = max(0, min(SCREEN_WIDTH - name_surf.get_width(), x))
+            self.screen.blit(name_surf, (x, max(0, self.gorilla_y[i] - name_surf.get_height())))
     
     def get_shot_input(self, player_num):
         #Get angle and velocity from player
+        self.follow(self.gorilla_x[player_num] + GORILLA_SIZE // 2)
         # Get angle
         angle = self.get_number_input("Angle:", player_num, 0, True)
         if angle is None:
             return None, None
         
         # Get velocity
-        velocity = self.get_number_input("Velocity:", player_num, 1, True)
+        velocity = self.get_number_input("Velocity:", player_num, 1, True, angle=angle)
         if velocity is None:
             return None, None
         
+        self.last_velocity[player_num] = velocity
         return angle, velocity
+
+    def preview_path(self, player_num, angle, velocity):
+        # Cached predicted path for a typed shot, extended by one frame's worth of steps.
+        # A gorilla knocked out mid-round no longer stops the banana, so it is part of the key.
+        key = (player_num, angle, velocity, self.wind, self.gravity, self.city_version,
+               tuple(self.gorilla_alive))
+        preview = self.previews.get(key)
+        if preview is None:
+            preview = TrajectoryPreview(self.trace_shot(player_num, angle, velocity))
+            self.previews[key] = preview
+            if len(self.previews) > PREVIEW_CACHE_SIZE:
+                self.previews.popitem(last=False)
+        else:
+            self.previews.move_to_end(key)
+        preview.extend(PREVIEW_STEPS_PER_FRAME)
+        return preview
+
+    def draw_preview(self, player_num, input_num, text, angle):
+        # Dotted predicted path for what is typed so far. While the angle is being typed
+        # the player's previous velocity (or the default 50) stands in for the velocity.
+        try:
+            value = float(text)
+        except ValueError:
+            return
+        if input_num == 0:
+            angle = min(value, 360)
+            velocity = self.last_velocity.get(player_num) or 50
+        else:
+            velocity = value
+        if angle is None:
+            return
+        color = EGA_PALETTE[15]
+        for i, (x, y) in enumerate(self.preview_path(player_num, angle, velocity).points):
+            x -= self.camera_x
+            if i % 2 == 0 and 0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT:
+                self.screen.set_at((x, y), color)
     
-    def get_number_input(self, prompt, player_num, input_num, redraw):
+    def get_number_input(self, prompt, player_num, input_num, redraw, angle=None):
         #Get numeric input during gameplay
+        # angle: the angle already entered, used by the aiming preview while typing velocity
         text = ""
         
         while True:
-            for event in pygame.event.get():
+            events = pygame.event.get()
+            for i, event in enumerate(events):
                 if event.type == pygame.QUIT:
                     return None
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_RETURN:
+                        # Keys typed ahead of the next prompt are left for it
+                        for later in events[i + 1:]:
+                            pygame.event.post(later)
                         try:
                             val = float(text) if text else 45
                             return min(val, 360) if input_num == 0 else val
@@ -859,22 +1080,23 @@ class QBasicGorillas:
                         text += event.unicode
             if redraw:
                 self.draw_scene()
+            if self.show_preview:
+                with self.timer.stage('preview'):
+                    self.draw_preview(player_num, input_num, text, angle)
             
-            # Draw player names
-            name_surf = self.player_font.render(self.player1_name, True, EGA_PALETTE[15])
-            self.screen.blit(name_surf, (5, 5))
-            name_surf = self.player_font.render(self.player2_name, True, EGA_PALETTE[15])
-            self.screen.blit(name_surf, (SCREEN_WIDTH - name_surf.get_width() - 5, 5))
-            
-            # Draw prompt
-            x_pos = 5 if player_num == 0 else SCREEN_WIDTH - 150
-            y_pos = 30 + input_num * 20
-            prompt_surf = self.small_font.render(f"{prompt} {text}_", True, EGA_PALETTE[15])
-            self.screen.blit(prompt_surf, (x_pos, y_pos))
+            with self.timer.stage('text'):
+                # Draw player names
+                self.draw_names(self.player_font)
+
+                # Draw prompt (on the side the gorilla throws from)
+                x_pos = 5 if self.gorilla_facing[player_num] > 0 else SCREEN_WIDTH - 150
+                y_pos = 30 + input_num * 20
+                prompt_surf = self.render_text(self.small_font, f"{prompt} {text}_", 15)
+                self.screen.blit(prompt_surf, (x_pos, y_pos))
             
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
-            self.clock.tick(30)
+            self.present()
+            with self.timer.stage('tick'):
+                self.clock.tick(30)
     
     def do_explosion(self, x, y):
         # Create explosion animation.
@@ -882,228 +1104,265 @@ class QBasicGorillas:
         # self.city_surf remain after the animation.
 
         PLAY("MBO0L32EFGEFDC")
-        x_i, y_i = int(x), int(y)
+        x_i, y_i = int(x) - self.camera_x, int(y)
 
         # Expanding ring
         for radius in range(2, 20, 2):
             self.draw_scene()
             pygame.draw.circle(self.screen, EGA_PALETTE[EXPLOSION_COLOR], (x_i, y_i), radius, 2)
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
+            self.present()
             pygame.time.wait(20)
 
         # Contracting ring
         for radius in range(20, 0, -2):
             self.draw_scene()
             pygame.draw.circle(self.screen, EGA_PALETTE[EXPLOSION_COLOR], (x_i, y_i), radius, 2)
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
+            self.present()
             pygame.time.wait(20)
     
-    def check_collision(self, x, y, shooter=None):
-        # Check if shot hits building or gorilla
-        # Check gorillas
-        for i in range(2):
-            # Ignore collision with the gorilla who just threw the banana
-            if shooter is not None and i == shooter:
-                continue
-            if (self.gorilla_x[i] <= x <= self.gorilla_x[i] + 30 and
-                self.gorilla_y[i] <= y <= self.gorilla_y[i] + 30):
-                return 'gorilla', i
-        # Check buildings (pixel-accurate against the damageable city surface)
-        ix, iy = int(x), int(y)
-        if self.city_surf is not None and 0 <= ix < SCREEN_WIDTH and 0 <= iy < SCREEN_HEIGHT:
-            if self.city_surf.get_at((ix, iy)).a > 0:
-                return 'building', None
-        elif self.city_surf is None:
-            # Fallback: rectangle tests
-            for bldg in self.buildings:
-                bottom = SCREEN_HEIGHT - 5
-                top = bottom - bldg['height']
-                if (bldg['x'] <= x <= bldg['x'] + bldg['width'] and
-                    top <= y <= bottom):
-                    return 'building', None
-        
-        # Check sun
-        cx = SCREEN_WIDTH // 2
-        cy = 40
-        if math.sqrt((x - cx)**2 + (y - cy)**2) < 12:
-            return 'sun', None
-        
-        return None, None
-    
-    def plot_shot(self, player_num, angle, velocity):
+    def plot_shot(self, player_num, angle, velocity, max_steps=None):
         # Animate banana shot
-        if player_num == 1:
-            angle = 180 - angle
-
-        angle_rad = math.radians(angle)
-
-        start_x = self.gorilla_x[player_num] + (25 if player_num == 0 else 5)
-        start_y = self.gorilla_y[player_num] + 8
-
-        init_xvel = math.cos(angle_rad) * velocity
-        init_yvel = math.sin(angle_rad) * velocity
-
-        t = 0.0
-
-        # Bigger "world" bounds so it can leave the screen and return
-        WORLD_MARGIN_X = 50
-        WORLD_MARGIN_Y = 50
-        MAX_T = 30.0  # safety so shots don't run forever
-
-        left_shooter = False  # NEW: has banana ever left the thrower's hitbox?
-
-        while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return None
-                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                    return None
-
-            x = start_x + (init_xvel * t) + (0.5 * (self.wind / 5) * t * t)
-            y = start_y + ((-1 * init_yvel * t) + (0.5 * self.gravity * t * t)) * (SCREEN_HEIGHT / 350)
-
-            if (x < -WORLD_MARGIN_X or x > SCREEN_WIDTH + WORLD_MARGIN_X or
-                y > SCREEN_HEIGHT + WORLD_MARGIN_Y or t > MAX_T):
+        # A throw cancelled with ESC leaves the step it stopped at in self.shot_cut (for replays).
+        # When cancelling isn't allowed, ESC just skips the rest of the flight animation.
+        self.mark_shot()
+        self.shot_cut = None
+        skip = False
+        for step, (t, x, y, coll_type, coll_data) in enumerate(
+                self.trace_shot(player_num, angle, velocity)):
+            self.shot_end = ('miss', t, x, y)
+            if max_steps is not None and step >= max_steps:
+                self.shot_cut = step
+                self.shot_end = ('cut', t, x, y)
                 return None
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and
+                                                 event.key == pygame.K_ESCAPE):
+                    if self.allow_cancel:
+                        self.shot_cut = step
+                        self.shot_end = ('cut', t, x, y)
+                        return None
+                    skip = True
 
             ix, iy = int(x), int(y)
-            on_screen = (0 <= ix < SCREEN_WIDTH and 0 <= iy < SCREEN_HEIGHT)
-
-            # NEW: once banana is outside the shooter's rectangle, allow self-hit
-            gx = self.gorilla_x[player_num]
-            gy = self.gorilla_y[player_num]
-            if not (gx <= ix <= gx + 30 and gy <= iy <= gy + 30):
-                left_shooter = True
-
-            ix, iy = int(x), int(y)
-
-            # Only collide/draw when it's actually on-screen
-            on_screen = (0 <= ix < SCREEN_WIDTH and 0 <= iy < SCREEN_HEIGHT)
 
-            if on_screen:
-                # Only ignore shooter BEFORE it has left the shooter hitbox
-                shooter_to_ignore = player_num if not left_shooter else None
-                coll_type, coll_data = self.check_collision(ix, iy, shooter=shooter_to_ignore)
+            if coll_type == 'sun':
+                self.sun_hit = True
 
-                if coll_type == 'sun':
-                    self.sun_hit = True
+            elif coll_type == 'building':
+                self.shot_end = ('building', t, x, y)
+                with self.timer.stage('carve_city'):
+                    carved = self.carve_city(ix, iy)
+                self.do_explosion(x, y)
+                if carved is not None and self.debris:
+                    self.animate_debris(carved[0], carved[1])
+                return None
 
-                elif coll_type == 'building':
-                    if self.city_surf is not None:
-                        pygame.draw.circle(self.city_surf, (0, 0, 0, 0), (ix, iy), 14)
-                    self.do_explosion(x, y)
-                    return None
+            elif coll_type == 'gorilla':
+                self.shot_end = ('gorilla', t, x, y)
+                self.gorilla_alive[coll_data] = False
+                self.draw_scene()
+                self.explode_gorilla(coll_data)
+                return coll_data
 
-                elif coll_type == 'gorilla':
-                    self.gorilla_alive[coll_data] = False
-                    self.draw_scene()
-                    self.explode_gorilla(coll_data)
-                    return coll_data
+            if skip:
+                continue
 
-                # Draw scene + banana only when visible
-                self.draw_scene()
+            self.follow(x)
+            self.draw_scene()
 
-                name_surf = self.font.render(self.player1_name, True, EGA_PALETTE[15])
-                self.screen.blit(name_surf, (5, 5))
-                name_surf = self.font.render(self.player2_name, True, EGA_PALETTE[15])
-                self.screen.blit(name_surf, (SCREEN_WIDTH - name_surf.get_width() - 5, 5))
+            with self.timer.stage('text'):
+                self.draw_names(self.font)
 
+            # Draw banana only when visible
+            ix -= self.camera_x
+            if 0 <= ix < SCREEN_WIDTH and 0 <= iy < SCREEN_HEIGHT:
                 rot = int((t * 10) % 4)
                 banana = self.banana_sprites[rot]
                 self.screen.blit(banana, (ix, iy))
 
-                self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-                pygame.display.flip()
-            else:
-                # Draw scene + banana only when visible
-                self.draw_scene()
-
-                name_surf = self.font.render(self.player1_name, True, EGA_PALETTE[15])
-                self.screen.blit(name_surf, (5, 5))
-                name_surf = self.font.render(self.player2_name, True, EGA_PALETTE[15])
-                self.screen.blit(name_surf, (SCREEN_WIDTH - name_surf.get_width() - 5, 5))
+            self.present()
+
+            with self.timer.stage('tick'):
+                self.clock.tick(FPS)
+
+        return None
+
+    def plot_volley(self, player_num, angle, velocity, max_steps=None):
+        # Animate a cluster banana: the banana and, after it bursts, all of its fragments are
+        # stepped together by a gorillas_projectiles.Volley. Landings flash a ring while the
+        # rest fly on instead of stopping the flight for a full explosion.
+        # Returns the gorillas hit, in order; cancelling works as in plot_shot.
+        self.mark_shot()
+        self.shot_cut = None
+        skip = False
+        volley = Volley(self)
+        volley.launch(player_num, angle, velocity, self.cluster)
+        blasts = []  # [x, y, frames shown]
+        self.shot_end = ('miss', 0.0, None, None)
+        while volley.active() or blasts:
+            if volley.active():
+                if max_steps is not None and volley.steps >= max_steps:
+                    self.shot_cut = volley.steps
+                    self.shot_end = ('cut',) + self.shot_end[1:]
+                    return volley.hits
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and
+                                                     event.key == pygame.K_ESCAPE):
+                        if self.allow_cancel:
+                            self.shot_cut = volley.steps
+                            self.shot_end = ('cut',) + self.shot_end[1:]
+                            return volley.hits
+                        skip = True
+
+                with self.timer.stage('projectiles'):
+                    impacts = volley.step()
+                if impacts:
+                    PLAY("MBO0L32EFGEFDC")
+                for index, impact, x, y, gorilla in impacts:
+                    # The throw ends where its last fragment landed (on a gorilla if any did)
+                    if impact == 'gorilla' or self.shot_end[0] != 'gorilla':
+                        self.shot_end = (impact, (volley.steps - 1) * SHOT_DT, x, y)
+                    if impact == 'gorilla':
+                        x = self.gorilla_x[gorilla] + GORILLA_SIZE // 2
+                        y = self.gorilla_y[gorilla] + GORILLA_SIZE // 2
+                    blasts.append([int(x), int(y), 0])
+
+            if skip:
+                blasts = []
+                continue
 
-                self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-                pygame.display.flip()
+            xs, ys, ts = volley.in_flight()
+            if len(xs):
+                self.follow(xs.mean())
+            self.draw_scene()
 
-            t += 0.1
-            self.clock.tick(FPS)
+            with self.timer.stage('text'):
+                self.draw_names(self.font)
+
+            xs = xs - self.camera_x
+            rots = ((ts * 10) % 4).astype(int)
+            self.screen.blits([(self.banana_sprites[rot], (x, y))
+                               for x, y, rot in zip(xs.astype(int).tolist(),
+                                                    ys.astype(int).tolist(), rots.tolist())
+                               if 0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT],
+                              doreturn=False)
+            for blast in blasts:
+                radius = 2 + 2 * blast[2] if blast[2] < BLAST_FRAMES else 2 * (
+                    2 * BLAST_FRAMES - blast[2])
+                pygame.draw.circle(self.screen, EGA_PALETTE[EXPLOSION_COLOR],
+                                   (blast[0] - self.camera_x, blast[1]), radius, 2)
+                blast[2] += 1
+            blasts = [blast for blast in blasts if blast[2] < 2 * BLAST_FRAMES]
+
+            self.present()
+
+            with self.timer.stage('tick'):
+                self.clock.tick(FPS)
+
+        if self.shot_end[0] == 'miss':
+            self.shot_end = ('miss', (volley.steps - 1) * SHOT_DT, None, None)
+        return volley.hits
 
     def explode_gorilla(self, player_num):
         # Gorilla explosion animation
         PLAY("MBO0L16EFGEFDC")
-        gx = self.gorilla_x[player_num] + 15
+        gx = self.gorilla_x[player_num] + 15 - self.camera_x
         gy = self.gorilla_y[player_num] + 15
         # Expanding circles
         for i in range(1, 25, 2):
             self.draw_scene()
             pygame.draw.circle(self.screen, EGA_PALETTE[EXPLOSION_COLOR],
                              (gx, gy), i)
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
+            self.present()
             pygame.time.wait(30)
         # Contracting circles
         for i in range(24, 0, -2):
             self.draw_scene()
             pygame.draw.circle(self.screen, EGA_PALETTE[EXPLOSION_COLOR],(gx, gy), i)
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
+            self.present()
             pygame.time.wait(30)
     
     def victory_dance(self, player_num):
         # Winning gorilla dance
-        self.gorilla_alive = [False, False]
+        self.gorilla_alive = [False] * self.num_players
+        self.follow(self.gorilla_x[player_num] + GORILLA_SIZE // 2)
+        gx = self.gorilla_x[player_num] - self.camera_x
         for i in range(4):
             PLAY("MFO0L32EFGEFDC")
             self.draw_scene()
-            self.screen.blit(self.gorilla_images['left'],
-                           (self.gorilla_x[player_num], self.gorilla_y[player_num]))
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
+            self.screen.blit(self.gorilla_images['left'], (gx, self.gorilla_y[player_num]))
+            self.present()
             pygame.time.wait(200)
             
             self.draw_scene()
-            self.screen.blit(self.gorilla_images['right'],
-                           (self.gorilla_x[player_num], self.gorilla_y[player_num]))
-            self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-            pygame.display.flip()
+            self.screen.blit(self.gorilla_images['right'], (gx, self.gorilla_y[player_num]))
+            self.present()
             pygame.time.wait(200)
     
-    def play_game(self):
+    def autosave(self):
+        # Snapshot the match at the start of a turn; the file is written in the background
+        if self.autosaver is not None:
+            self.autosaver.submit(take_snapshot(self))
+
+    def play_game(self, shots=None, resume=False):
         # Main game loop
-        current_player = 0
+        # shots: optional callable(player) -> (angle, velocity, cut) used instead of asking the
+        #        players at the keyboard (replays, network play); angle None ends the game
+        # resume: carry on from a restored snapshot instead of starting a new match
+        if not resume or self.replay is None:
+            self.replay = Replay(self.seed, self.gravity, self.num_games,
+                                 num_players=self.num_players, cluster=self.cluster,
+                                 world_width=self.world_width, debris=self.debris)
+        if not resume:
+            self.current_player = 0
         
-        while self.scores[0] < self.num_games and self.scores[1] < self.num_games:
-            # Setup new round
-            self.make_cityscape()
-            self.place_gorillas()
-            self.gorilla_alive = [True, True]
-            self.sun_hit = False
+        next_round = None  # the next round, being prepared while the last one winds down
+        while not self.match_over():
+            # Setup new round (a resumed match is already mid-round)
+            if not resume:
+                self.start_round(next_round.result() if next_round is not None else None)
+                if self.stats is not None:
+                    self.stats.log_round(self)
+            resume = False
             
             hit = False
             while not hit:
-                angle, velocity = self.get_shot_input(current_player)
+                self.autosave()
+                cut = None
+                if shots is not None:
+                    angle, velocity, cut = shots(self.current_player)
+                else:
+                    angle, velocity = self.get_shot_input(self.current_player)
                 if angle is None:
                     return False
                 PLAY("MBo0L32A-L64CL16BL64A+")
-                hit_player = self.plot_shot(current_player, angle, velocity)
+                if self.cluster:
+                    hits = self.plot_volley(self.current_player, angle, velocity, max_steps=cut)
+                else:
+                    hit_player = self.plot_shot(self.current_player, angle, velocity,
+                                                max_steps=cut)
+                    hits = [] if hit_player is None else [hit_player]
+                self.replay.record_shot(angle, velocity, self.shot_cut)
+                if self.stats is not None:
+                    self.stats.log_shot(self.current_player, angle, velocity, self.shot_end,
+                                        hits, self.sun_hit)
                 
-                if hit_player is not None:
-                    hit = True
-                    if hit_player == current_player:
-                        # Hit self
-                        self.scores[1 - current_player] += 1
+                if hits:
+                    winner = self.award_hits(self.current_player, hits)
+                    if winner is not None:
+                        # Last gorilla standing takes the round. The next one is built on
+                        # the worker thread meanwhile (nothing here uses the rng).
+                        hit = True
+                        if not self.match_over():
+                            next_round = self.prepare_round_async()
+                        self.victory_dance(winner)
+                        self.current_player = self.next_player(self.current_player, True)
                     else:
-                        self.scores[current_player] += 1
-                    
-                    winner = current_player if hit_player != current_player else 1 - current_player
-                    self.victory_dance(winner)
-                    current_player = 1 - current_player
+                        self.current_player = self.next_player(self.current_player)
+                        self.sun_hit = False
                 else:
                     # Miss - switch players
-                    current_player = 1 - current_player
+                    self.current_player = self.next_player(self.current_player)
                     self.sun_hit = False
             
             pygame.time.wait(1000)
@@ -1116,15 +1375,12 @@ class QBasicGorillas:
         self.center_text("GAME OVER!", 100, 15)
         self.center_text("Score:", 140, 7)
         
-        p1_text = f"{self.player1_name}: {self.scores[0]}"
-        p2_text = f"{self.player2_name}: {self.scores[1]}"
-        
-        self.center_text(p1_text, 170, 7)
-        self.center_text(p2_text, 195, 7)
+        step = 25 if self.num_players <= 4 else 16
+        for i, name in enumerate(self.player_names):
+            self.center_text(f"{name}: {self.scores[i]}", 170 + i * step, 7)
         self.center_text("Press any key to exit", SCREEN_HEIGHT - 40, 7)
         
-        self.display.blit(pygame.transform.scale(self.screen, self.display.get_size()), (0, 0))
-        pygame.display.flip()
+        self.present()
         
         waiting = True
         while waiting:
@@ -1133,8 +1389,18 @@ class QBasicGorillas:
                     waiting = False
             pygame.time.wait(100)
 
-    def run(self):
+    def run(self, record=None, resume=None, autosave=None):
         # Main program flow
+        # record: optional path to save the match replay to
+        # resume: optional snapshot to continue instead of starting a new match
+        # autosave: optional path to snapshot the match to at the start of every turn
+        if autosave:
+            self.autosaver = AutoSaver(autosave)
+        if resume:
+            load_snapshot(self, resume)
+            self.finish_match(self.play_game(resume=True), record)
+            return
+
         # Intro screen
         if not self.intro_screen():
             return
@@ -1152,11 +1418,279 @@ class QBasicGorillas:
             self.view_intro()
         
         # Play game
-        if self.play_game():
+        self.finish_match(self.play_game(), record)
+
+    def finish_match(self, finished, record):
+        self.save_replay(record)
+        if self.autosaver is not None:
+            error = self.autosaver.flush()
+            if error is not None:
+                print(f"Could not autosave to {self.autosaver.path}: {error}")
+        if finished:
             self.game_over()
         
         pygame.quit()
 
+    def save_replay(self, path):
+        # Write the inputs, final scores and city checksum of the last match
+        if path is None or self.replay is None:
+            return
+        self.replay.finish(self.scores, self.city_checksum())
+        self.replay.save(path)
+
+    def run_replay(self, replay):
+        # Visual playback of a recorded match
+        self.set_num_players(replay.num_players)
+        self.cluster = replay.cluster
+        self.set_world_width(replay.world_width)
+        self.debris = replay.debris
+        self.player_names = [f"Player {i + 1}" for i in range(self.num_players)]
+        self.gravity = replay.gravity
+        self.num_games = replay.num_games
+        self.reseed(replay.seed)
+        shots = iter(replay.shots)
+        if self.play_game(shots=lambda player: next(shots, (None, None, None))):
+            self.game_over()
+        pygame.quit()
+
+    def run_selftest(self, points=1, max_throws=500):
+        # Headless check of the turn logic: play a match to `points` with every throw typed
+        # at the angle and velocity prompts (aim preview on), then re-simulate its replay.
+        # Each throw is the one of a coarse grid that hits a gorilla still standing, or else
+        # lands closest to one. Returns (finished within max_throws, replay verified).
+        from gorillas_replay import verify
+        from gorillas_search import outcome_map
+
+        angles = np.arange(5, 90, 5)
+        velocities = np.arange(10, 205, 5)
+        self.player_names = [f"Player {i + 1}" for i in range(self.num_players)]
+        self.num_games = points
+        self.show_preview = True
+
+        def type_shot(player):
+            if len(self.replay.shots) >= max_throws:
+                return None, None, None
+            outcomes, impact_x = outcome_map(self, player, angles, velocities, processes=1)
+            targets = [i for i, alive in enumerate(self.gorilla_alive) if alive and i != player]
+            centers = np.array([self.gorilla_x[i] + GORILLA_SIZE // 2 for i in targets])
+            miss = np.abs(impact_x[..., None] - centers).min(axis=-1)
+            best = np.unravel_index(np.argmin(np.where(np.isin(outcomes, targets), -1, miss)),
+                                    outcomes.shape)
+            for value in (angles[best[0]], velocities[best[1]]):
+                for char in str(value):
+                    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=0, unicode=char))
+                pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RETURN,
+                                                     unicode='\r'))
+            angle, velocity = self.get_shot_input(player)
+            return angle, velocity, None
+
+        finished = self.play_game(shots=type_shot)
+        self.replay.finish(self.scores, self.city_checksum())
+        return finished, verify(self.replay)
+
+    def run_network(self, host, port, name):
+        # Play one side of a networked match (see gorillas_net.py). The server decides the
+        # seed and settings; every throw, ours included, is animated when its result arrives.
+        from gorillas_net import NetworkSession
+
+        session = NetworkSession(host, port, name)
+        while not session.welcomed.is_set():
+            if not self.wait_screen("Waiting for another player..."):
+                pygame.quit()
+                return
+        client = session.client
+        if client.match is None:
+            print(f"Could not join the game at {host}:{port}")
+            pygame.quit()
+            return
+
+        self.set_num_players(client.match.num_players)
+        self.player_names = list(client.match.player_names)
+        self.gravity = client.match.gravity
+        self.num_games = client.match.num_games
+        # The battlefield settings are the server's too, whatever --screens/--debris/--cluster
+        # were given locally
+        self.cluster = client.match.cluster
+        self.set_world_width(client.match.world_width)
+        self.debris = client.match.debris
+        self.reseed(client.match.seed)
+        self.allow_cancel = False
+        shots = lambda player: self.network_shot(session, player)
+        if self.play_game(shots=shots):
+            self.game_over()
+        pygame.quit()
+
+    def network_shot(self, session, player):
+        # Our turn: ask for the shot and send it. Either way, wait for the server's result.
+        if player == session.client.index:
+            angle, velocity = self.get_shot_input(player)
+            if angle is None:
+                return None, None, None
+            session.send_shot(angle, velocity)
+        while True:
+            try:
+                kind, data = session.results.get_nowait()
+            except queue.Empty:
+                if not self.wait_screen(f"Waiting for {self.player_names[player]}...",
+                                        scene=True):
+                    return None, None, None
+                continue
+            if kind == 'result':
+                thrower, angle, velocity = data
+                return angle, velocity, None
+            if kind == 'error':
+                print(f"Connection lost: {data}")
+            return None, None, None
+
+    def run_spectator(self, host, port):
+        # Watch a networked match (gorillas_net.py serve --spectators). The stream starts
+        # from a snapshot of the current turn, so joining part-way through works.
+        from gorillas_spectate import SpectatorSession
+
+        session = SpectatorSession(host, port)
+        while True:
+            try:
+                kind, data = session.events.get_nowait()
+            except queue.Empty:
+                if not self.wait_screen("Waiting for the match to start..."):
+                    pygame.quit()
+                    return
+                continue
+            if kind == 'sync':
+                restore_snapshot(self, data)
+                break
+            print(f"Could not watch the game at {host}:{port}")
+            pygame.quit()
+            return
+
+        self.allow_cancel = False
+        if self.play_game(shots=lambda player: self.spectator_shot(session), resume=True):
+            self.game_over()
+        pygame.quit()
+
+    def spectator_shot(self, session):
+        # Next throw from the stream. A snapshot in between means we fell behind and were
+        # caught up by the server; it always describes the start of a turn, like here.
+        while True:
+            try:
+                kind, data = session.events.get_nowait()
+            except queue.Empty:
+                name = self.player_names[self.current_player]
+                if not self.wait_screen(f"{name} is aiming...", scene=True):
+                    return None, None, None
+                continue
+            if kind == 'sync':
+                restore_snapshot(self, data)
+                continue
+            if kind == 'shot':
+                thrower, angle, velocity = data
+                return angle, velocity, None
+            if kind == 'error':
+                print(f"Connection lost: {data}")
+            return None, None, None
+
+    def wait_screen(self, message, scene=False):
+        # One frame of a waiting message; False if the player closed the window
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and
+                                             event.key == pygame.K_ESCAPE):
+                return False
+        if scene:
+            self.draw_scene()
+        else:
+            self.screen.fill(EGA_PALETTE[0])
+        self.center_text(message, 60 if scene else SCREEN_HEIGHT // 2, 15)
+        self.present()
+        self.clock.tick(30)
+        return True
+
 if __name__ == "__main__":
-    game = QBasicGorillas()
-    game.run()
+    import argparse
+    parser = argparse.ArgumentParser(description="QBasic Gorillas")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible match")
+    parser.add_argument("--record", default=None, help="save a replay of the match to this file")
+    parser.add_argument("--replay", default=None, help="play back a recorded replay file")
+    parser.add_argument("--players", type=int, default=2,
+                        help="number of gorillas in a local free-for-all (2-8)")
+    parser.add_argument("--cluster", type=int, default=0, metavar="N",
+                        help="bananas burst into N fragments at the top of their flight")
+    parser.add_argument("--screens", type=int, default=1,
+                        help="battlefield width in screens; wider ones scroll with the banana")
+    parser.add_argument("--debris", action="store_true",
+                        help="let what explosions undercut crumble and fall")
+    parser.add_argument("--aim-preview", action="store_true",
+                        help="show the predicted banana path while typing a shot")
+    parser.add_argument("--autosave", default=None,
+                        help="snapshot the match to this file after every shot")
+    parser.add_argument("--resume", default=None, help="continue a match from a snapshot file")
+    parser.add_argument("--connect", default=None, metavar="HOST:PORT",
+                        help="join a networked match (see gorillas_net.py serve)")
+    parser.add_argument("--name", default="Player", help="your name in a networked match")
+    parser.add_argument("--watch", default=None, metavar="HOST:PORT",
+                        help="watch a networked match (see gorillas_net.py serve --spectators)")
+    parser.add_argument("--frame-stats", action="store_true",
+                        help="show per-stage frame times on screen")
+    parser.add_argument("--trace", default=None, metavar="FILE",
+                        help="record frame timings and write them on exit (.json Chrome trace "
+                             "or .csv)")
+    parser.add_argument("--audio-rate", type=int, default=AUDIO_RATE, metavar="HZ",
+                        help="mixer sample rate")
+    parser.add_argument("--audio-buffer", type=int, default=AUDIO_BUFFER, metavar="SAMPLES",
+                        help="mixer buffer size (see gorillas_audio.py for picking one)")
+    parser.add_argument("--audio-channels", type=int, default=AUDIO_CHANNELS, choices=[1, 2],
+                        help="mono or stereo output")
+    parser.add_argument("--audio-offset", type=float, default=0.0, metavar="MS",
+                        help="delay sound effects by this much, for a display that lags "
+                             "behind the sound")
+    parser.add_argument("--stats", default=None, metavar="DIR",
+                        help="append round and shot statistics to this columnar log "
+                             "(see gorillas_stats)")
+    parser.add_argument("--selftest", action="store_true",
+                        help="play a seeded match for every free-for-all size headlessly and "
+                             "verify the replays")
+    args = parser.parse_args()
+    if args.audio_offset < 0:
+        parser.error("--audio-offset cannot be negative")
+
+    if args.selftest:
+        import os
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        failed = 0
+        for players in range(3, MAX_PLAYERS + 1):
+            started = time.perf_counter()
+            game = QBasicGorillas(seed=(args.seed or 0) + players, num_players=players)
+            finished, verified = game.run_selftest()
+            print(f"{players} players: {'-'.join(map(str, game.scores))} after "
+                  f"{len(game.replay.shots)} throws, replay "
+                  f"{'verified' if verified else 'MISMATCH'} "
+                  f"({time.perf_counter() - started:.1f}s)")
+            failed += not (finished and verified)
+        pygame.quit()
+        sys.exit(1 if failed else 0)
+
+    set_audio_offset(args.audio_offset)
+    game = QBasicGorillas(seed=args.seed, num_players=args.players,
+                          audio=(args.audio_rate, args.audio_buffer, args.audio_channels))
+    game.show_preview = args.aim_preview
+    game.cluster = args.cluster
+    game.set_world_width(args.screens * SCREEN_WIDTH)
+    game.debris = args.debris
+    if args.stats:
+        game.stats = StatsLog(args.stats)
+    if args.frame_stats or args.trace:
+        game.enable_timing(overlay=args.frame_stats)
+    if args.replay:
+        game.run_replay(Replay.load(args.replay))
+    elif args.connect:
+        host, _, port = args.connect.rpartition(':')
+        game.run_network(host or 'localhost', int(port), args.name)
+    elif args.watch:
+        host, _, port = args.watch.rpartition(':')
+        game.run_spectator(host or 'localhost', int(port))
+    else:
+        game.run(record=args.record, resume=args.resume, autosave=args.autosave)
+    if args.trace:
+        game.timer.export(args.trace)
+    if game.stats is not None:
+        game.stats.close()
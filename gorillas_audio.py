@@ -0,0 +1,128 @@
+# Audio latency probe for GORILLAS_BAS.py.
+# For each mixer buffer size, re-opens the mixer and plays a short note through PLAY a
+# number of times, measuring
+#   dispatch   PLAY call -> the note handed to the mixer (thread start, synthesis, play())
+#   late       how much longer than its own length the note kept the mixer channel busy;
+#              the mixer works a buffer at a time, so up to one buffer period is expected,
+#              and more means the audio callback ran late (an underrun)
+# and estimates the output latency as dispatch plus two buffer periods (the one being
+# mixed and the one the device is playing). The smallest buffer without underruns is the
+# one to use: it is how far sound effects trail their frames, and the game never holds a
+# frame back to wait for them.
+#
+#   python gorillas_audio.py --buffers 256 512 1024 2048 --rate 44100 --channels 1
+#   python GORILLAS_BAS.py --audio-buffer 512
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import pygame
+
+import GORILLAS_BAS
+from GORILLAS_BAS import AUDIO_CHANNELS, AUDIO_RATE, PLAY
+
+BUFFERS = (256, 512, 1024, 2048, 4096)
+PROBE_NOTE = "MBT120O4L16C"  # one background C, 125 ms
+UNDERRUN_SLACK_MS = 2.0  # scheduling jitter tolerated on top of one buffer period
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def probe_buffer(buffer, rate=AUDIO_RATE, channels=AUDIO_CHANNELS, trials=20):
+    # Measure one buffer size; returns a dict of results (times in ms)
+    pygame.mixer.quit()
+    pygame.mixer.init(rate, -16, channels, buffer)
+    rate, _, channels = pygame.mixer.get_init()  # what the device actually gave us
+    (freq, duration), = GORILLAS_BAS.parse_play(PROBE_NOTE)
+    period = buffer / rate * 1000
+
+    dispatch = []
+    late = []
+    for trial in range(trials + 1):
+        started = threading.Event()
+        t0 = time.perf_counter()
+        PLAY(PROBE_NOTE, started=started)
+        started.wait(1.0)
+        t1 = time.perf_counter()
+        # PLAY stops its channel after the note's length, so time a bare copy of the note
+        # to see when the mixer really finished with it
+        sound = pygame.sndarray.make_sound(GORILLAS_BAS._square_wave(freq, duration))
+        time.sleep(duration + 2 * period / 1000)
+        t2 = time.perf_counter()
+        channel = sound.play()
+        while channel is not None and channel.get_busy():
+            time.sleep(0.0002)
+        t3 = time.perf_counter()
+        if trial:  # the first round fills the caches
+            dispatch.append((t1 - t0) * 1000)
+            late.append(max(0.0, (t3 - t2 - duration) * 1000))
+
+    underruns = sum(1 for ms in late if ms > period + UNDERRUN_SLACK_MS)
+    return {
+        'buffer': buffer,
+        'rate': rate,
+        'channels': channels,
+        'period_ms': period,
+        'dispatch_ms': statistics.median(dispatch),
+        'late_ms': statistics.median(late),
+        'late_p95_ms': _percentile(late, 0.95),
+        'underruns': underruns,
+        'latency_ms': statistics.median(dispatch) + 2 * period,
+    }
+
+
+def probe(buffers=BUFFERS, rate=AUDIO_RATE, channels=AUDIO_CHANNELS, trials=20):
+    pygame.init()
+    results = [probe_buffer(buffer, rate, channels, trials) for buffer in buffers]
+    pygame.quit()
+    return results
+
+
+def recommend(results):
+    # The smallest buffer that never underran (None if all did)
+    clean = [r for r in results if not r['underruns']]
+    return min(clean, key=lambda r: r['buffer']) if clean else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Gorillas sound latency per buffer size")
+    parser.add_argument("--buffers", type=int, nargs="+", default=list(BUFFERS))
+    parser.add_argument("--rate", type=int, default=AUDIO_RATE)
+    parser.add_argument("--channels", type=int, default=AUDIO_CHANNELS, choices=[1, 2])
+    parser.add_argument("--trials", type=int, default=20, help="notes played per buffer size")
+    parser.add_argument("--json", default=None, help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = probe(args.buffers, args.rate, args.channels, args.trials)
+    print(f"{'buffer':>7} {'period':>8} {'dispatch':>9} {'late':>7} {'late p95':>9} "
+          f"{'underruns':>10} {'latency':>8}")
+    for r in results:
+        print(f"{r['buffer']:7d} {r['period_ms']:6.1f}ms {r['dispatch_ms']:7.2f}ms "
+              f"{r['late_ms']:5.1f}ms {r['late_p95_ms']:7.1f}ms {r['underruns']:10d} "
+              f"{r['latency_ms']:6.1f}ms")
+    best = recommend(results)
+    if best is None:
+        print("Every buffer size underran; try a larger one")
+    else:
+        print(f"Use --audio-rate {best['rate']} --audio-buffer {best['buffer']} "
+              f"--audio-channels {best['channels']} "
+              f"(sound trails the picture by about {best['latency_ms']:.0f}ms)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'results': results, 'recommended': best}, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,293 @@
+# Headless benchmarks for the hot paths of GORILLAS_BAS.py.
+# Runs under SDL's dummy video/audio drivers (no window, no sound), times each case with a
+# fixed seed and writes the results as JSON, so two versions can be compared directly:
+#
+#   python gorillas_bench.py --json before.json
+#   python gorillas_bench.py --json after.json --compare before.json
+#
+# Times are per operation in milliseconds (min/median/mean over --repeat runs). Animations
+# are timed without their deliberate waits: the frame clock never sleeps and explosions
+# are skipped, so plot_shot measures the flight itself (collisions, drawing, scaling, flip).
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+
+import numpy as np
+import pygame
+
+import GORILLAS_BAS
+from GORILLAS_BAS import BANANA_DOWN, BANANA_LEFT, BANANA_RIGHT, BANANA_UP, QBasicGorillas
+from gorillas_core import CITY_BOTTOM, CRATER_RADIUS, SCREEN_HEIGHT, SCREEN_WIDTH
+from gorillas_projectiles import Volley
+
+SEED = 1234
+# Every PLAY string the game uses
+PLAY_STRINGS = [
+    "MBT160O1L8CDEDCDL4ECC",
+    "t120o1l16b9n0baan0bn0bn0baaan0b9n0baan0b",
+    "o2l16e-9n0e-d-d-n0e-n0e-n0e-d-d-d-n0e-9n0e-d-d-n0e-",
+    "T160O0L32EFGEFDC",
+    "MBO0L32EFGEFDC",
+    "MBO0L16EFGEFDC",
+    "MFO0L32EFGEFDC",
+    "MBo0L32A-L64CL16BL64A+",
+]
+
+
+class _NoWaitClock:
+    # Stand-in for pygame.time.Clock that never throttles a loop
+    def tick(self, framerate=0):
+        return 0
+
+
+def measure(func, repeat, number=1, setup=None):
+    # Per-operation times in ms; setup runs untimed before each batch of `number` calls
+    func()  # warm up caches and lazy imports
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - started) * 1000 / number)
+    return {
+        'min_ms': min(times),
+        'median_ms': statistics.median(times),
+        'mean_ms': statistics.fmean(times),
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def make_game():
+    game = QBasicGorillas(seed=SEED)
+    game.player1_name = "Player 1"
+    game.player2_name = "Player 2"
+    game.clock = _NoWaitClock()
+    game.do_explosion = lambda x, y: None
+    game.explode_gorilla = lambda player_num: None
+    game.start_round()
+    return game
+
+
+def bench_sprites(game, repeat):
+    bananas = [BANANA_LEFT, BANANA_UP, BANANA_DOWN, BANANA_RIGHT]
+    arrays = [game.decode_put_array(data) for data in bananas]
+    return {
+        'decode_put_array': measure(
+            lambda: [game.decode_put_array(data) for data in bananas], repeat),
+        'create_surface_from_array': measure(
+            lambda: [game.create_surface_from_array(array) for array in arrays], repeat),
+        'create_gorilla_images': measure(game.create_gorilla_images, repeat),
+    }
+
+
+def bench_city(game, repeat):
+    game.reseed(SEED)
+    results = {
+        'make_cityscape': measure(game.make_cityscape, repeat),
+        'rebuild_city': measure(game.rebuild_city, repeat),
+    }
+
+    # Debris after a crater blown into the foot of the tallest building, which leaves the
+    # most pixels hanging
+    state = game.city_state()
+    tallest = game.buildings[int(game.buildings['height'].argmax())]
+    x = int(tallest['x'] + tallest['width'] // 2)
+    y = SCREEN_HEIGHT - CITY_BOTTOM - CRATER_RADIUS
+
+    def blast():
+        x0, x1 = game.carve_city(x, y)[:2]
+        game.settle_debris(x0, x1)
+
+    results['settle_debris'] = measure(blast, repeat, setup=lambda: game.load_city_state(*state))
+
+    # Rewinding the damage log to the middle of a round of 24 throws
+    def play():
+        game.load_city_state(*state)
+        for k in range(24):
+            game.simulate_shot(k % 2, 10 + k, 35)
+            game.gorilla_alive = [True] * game.num_players
+
+    play()
+    results['rewind_city'] = measure(lambda: game.rewind_city(12), repeat, setup=play)
+
+    # A new round generated on the spot vs one prepared during the last round's animation
+    # (the work left on the critical path is swapping it in)
+    prepared = []
+
+    def prepare():
+        prepared[:] = [game.prepare_round()]
+
+    prepare()
+    results['start_round'] = measure(game.start_round, repeat)
+    results['start_prepared_round'] = measure(lambda: game.start_round(prepared[0]), repeat,
+                                              setup=prepare)
+    return results
+
+
+def bench_collisions(game, repeat, points=10000):
+    # Random points over the whole screen, so every branch of the test is exercised
+    game.reseed(SEED)
+    game.start_round()
+    rng = random.Random(SEED)
+    xs = [rng.uniform(0, SCREEN_WIDTH - 1) for _ in range(points)]
+    ys = [rng.uniform(0, SCREEN_HEIGHT - 1) for _ in range(points)]
+    check = game.check_collision
+
+    def run():
+        for x, y in zip(xs, ys):
+            check(x, y, 0)
+
+    result = measure(run, repeat)
+    for key in ('min_ms', 'median_ms', 'mean_ms'):
+        result[key] /= points
+    result['number'] = points
+    return {'check_collision': result}
+
+
+def bench_shots(game, repeat):
+    # The same throw from the same pristine round each time: it flies across most of the
+    # screen and lands on a building
+    game.reseed(SEED)
+    game.start_round()
+    state = game.city_state()
+    gorillas = (list(game.gorilla_x), list(game.gorilla_y))
+
+    def reset():
+        game.load_city_state(*state)
+        game.gorilla_x, game.gorilla_y = list(gorillas[0]), list(gorillas[1])
+        game.gorilla_alive = [True, True]
+        game.sun_hit = False
+
+    steps = sum(1 for _ in game.trace_shot(0, 45, 60))
+    results = {
+        'plot_shot': measure(lambda: game.plot_shot(0, 45, 60), repeat, setup=reset),
+        'simulate_shot': measure(lambda: game.simulate_shot(0, 45, 60), repeat, setup=reset),
+    }
+    results['plot_shot']['steps'] = steps
+    return results
+
+
+def bench_projectiles(game, repeat, count=500):
+    # One step of `count` bananas scattered over the sky, all flying; the city is restored
+    # before each step so the landings carve the same craters every time
+    game.reseed(SEED)
+    game.start_round()
+    state = game.city_state()
+    rng = random.Random(SEED)
+    launches = [(rng.uniform(0, SCREEN_WIDTH), rng.uniform(0, SCREEN_HEIGHT // 2),
+                 rng.uniform(-60, 60), rng.uniform(-20, 60)) for _ in range(count)]
+    volleys = []
+
+    def reset():
+        game.load_city_state(*state)
+        game.gorilla_alive = [True] * game.num_players
+        volley = Volley(game, count)
+        for x, y, vx, vy in launches:
+            volley.spawn(x, y, vx, vy, 0, left_owner=True)
+        volleys[:] = [volley]
+
+    reset()
+    result = measure(lambda: volleys[0].step(), repeat, setup=reset)
+    result['projectiles'] = count
+    return {'volley_step': result}
+
+
+def bench_frame(game, repeat):
+    game.reseed(SEED)
+    game.start_round()
+
+    def frame():
+        game.draw_scene()
+        game.present()
+
+    return {
+        'draw_scene': measure(game.draw_scene, repeat),
+        'scale_flip': measure(game.present, repeat),
+        'frame': measure(frame, repeat),
+    }
+
+
+def bench_sound(repeat):
+    return {
+        'parse_play': measure(
+            lambda: [GORILLAS_BAS.parse_play(s) for s in PLAY_STRINGS], repeat),
+        'square_wave': measure(
+            lambda: [GORILLAS_BAS._square_wave(freq, dur) for s in PLAY_STRINGS
+                     for freq, dur in GORILLAS_BAS.parse_play(s) if freq > 0], repeat),
+    }
+
+
+def run_benchmarks(repeat=20, only=None):
+    game = make_game()
+    suites = [
+        ('sprites', lambda: bench_sprites(game, repeat)),
+        ('city', lambda: bench_city(game, repeat)),
+        ('collisions', lambda: bench_collisions(game, max(3, repeat // 4))),
+        ('shots', lambda: bench_shots(game, max(3, repeat // 2))),
+        ('projectiles', lambda: bench_projectiles(game, repeat)),
+        ('frame', lambda: bench_frame(game, repeat * 5)),
+        ('sound', lambda: bench_sound(repeat)),
+    ]
+    results = {}
+    for name, suite in suites:
+        if only and name not in only:
+            continue
+        results.update(suite())
+    pygame.quit()
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'seed': SEED,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Gorillas benchmarks")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per case")
+    parser.add_argument("--only", nargs="*", default=None,
+                        choices=["sprites", "city", "collisions", "shots", "projectiles",
+                                 "frame", "sound"])
+    parser.add_argument("--json", default=None, help="write results to this file")
+    parser.add_argument("--compare", default=None, help="earlier --json output to compare with")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat, args.only)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    for name, r in results.items():
+        line = f"{name:28s} {r['median_ms']:10.4f} ms  (min {r['min_ms']:.4f})"
+        if baseline and name in baseline:
+            line += f"  x{r['median_ms'] / baseline[name]['median_ms']:.2f} vs baseline"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
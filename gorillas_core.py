@@ -0,0 +1,753 @@
+# Game rules of the QBasic Gorillas port, without pygame.
+# GorillasMatch holds the match state (city, wind, gorillas, scores, whose turn it is)
+# and implements cityscape generation, banana physics, collisions and scoring.
+# GORILLAS_BAS.py layers the pygame window, drawing and sound on top of it, while
+# simulations, replays and tests use it directly. numpy is only imported once a
+# city is actually generated, so importing this module and constructing a match is cheap.
+#
+# A match has 2 to 8 players. With more than two it is a free-for-all: a gorilla that is
+# hit sits out the rest of the round, and the last one standing wins the round's point
+# (which, with two players, is exactly the original rule).
+
+import math
+import random
+import zlib
+
+SCREEN_WIDTH = 640
+SCREEN_HEIGHT = 350
+CITY_BOTTOM = 15
+
+# Banana flight: time step per frame, and how far it may leave the screen and return
+SHOT_DT = 0.1
+WORLD_MARGIN_X = 50
+WORLD_MARGIN_Y = 50
+MAX_SHOT_T = 30.0  # safety so shots don't run forever
+
+# EGA colors the city is built from
+BUILDING_COLORS = (4, 5, 6, 7)
+WINDOWCOLOR = 14  # Yellow windows
+DARK_WINDOWCOLOR = 8
+
+# Array-backed city. Each building is one building_dtype() record; 'windows' holds the EGA
+# color of every window slot (column, row), 0 where the building has no window.
+WINDOW_COLS = 7     # widest building (74) fits 7 columns of windows 10 pixels apart
+WINDOW_ROWS = 13    # tallest building (200) fits 13 rows of windows 15 pixels apart
+MAX_BUILDINGS = 17  # narrowest building plus gap is 39 pixels (see max_buildings)
+CRATER_RADIUS = 14
+RASTER_PAD = 16  # room for the last window block to overhang the right/bottom edge
+GORILLA_SIZE = 30  # gorilla sprites (and their hit masks) are 30x30
+MIN_PLAYERS = 2
+MAX_PLAYERS = 8
+GRID_CELL = 32  # cell size of the gorilla spatial index; a gorilla box spans at most 2x2
+MAX_WORLD_WIDTH = 64 * SCREEN_WIDTH  # widest scrolling battlefield (see gorillas_world)
+MAX_POINTS = 0xFFFF  # most points to play to (replays and snapshots keep 16-bit scores)
+
+# Hit masks of the three gorilla poses, as rendered by QBasicGorillas.create_gorilla_images.
+# One hex word per column x; bit (29 - y) is set where the sprite has a visible pixel.
+GORILLA_MASK_DATA = {
+    'down': ['00000000', '0000fe00', '0003ff80', '000fffc0', '000fffc0', '000fffc0',
+             '000f01c0', '001fc07f', '001fc0ff', '001fffff', '071fffff', '1fdfffff',
+             '1fffffc0', '1fffff00', '1fffff00', '1fffff00', '1fffff80', '1fffffff',
+             '071fffff', '001fffff', '001fe1ff', '001fc0ff', '000e03c0', '000fffc0',
+             '000fffc0', '000fffc0', '0007ff00', '0001fc00', '00000000', '00000000'],
+    'left': ['00000000', '07f00000', '1ffc0000', '3ffe0000', '3ffe0000', '3ffe0000',
+             '380e0000', '201fc03f', '001fc0ff', '001fffff', '071fffff', '1fdfffff',
+             '1fffffc0', '1fffff00', '1fffff00', '1fffff00', '1fffff80', '1fffffff',
+             '071fffff', '001fffff', '001fe1ff', '001fc0ff', '000e03c0', '000fffc0',
+             '000fffc0', '000fffc0', '0007ff00', '0001fc00', '00000000', '00000000'],
+    'right': ['00000000', '0000fe00', '0003ff80', '000fffc0', '000fffc0', '000fffc0',
+              '000f01c0', '001fc07f', '001fc0ff', '001fffff', '071fffff', '1fdfffff',
+              '1fffffc0', '1fffff00', '1fffff00', '1fffff00', '1fffff80', '1fffffff',
+              '071fffff', '001fffff', '001fe1ff', '201fc07f', '301e0000', '3ffe0000',
+              '3ffe0000', '3ffe0000', '1ff80000', '0fe00000', '00000000', '00000000'],
+}
+
+_building_dtype = None
+_gorilla_masks = None
+_crater_cache = {}
+
+
+def building_dtype():
+    # numpy dtype of one building record (created on first use to keep imports cheap)
+    global _building_dtype
+    if _building_dtype is None:
+        import numpy as np
+        _building_dtype = np.dtype([
+            ('x', np.int32),
+            ('width', np.int32),
+            ('height', np.int16),
+            ('color', np.uint8),
+            ('windows', np.uint8, (WINDOW_COLS, WINDOW_ROWS)),
+        ])
+    return _building_dtype
+
+
+def gorilla_masks():
+    # Flat bytes per pose with mask[dx * GORILLA_SIZE + dy] set on visible sprite pixels
+    global _gorilla_masks
+    if _gorilla_masks is None:
+        _gorilla_masks = {}
+        for pose, columns in GORILLA_MASK_DATA.items():
+            bits = bytearray()
+            for word in columns:
+                col = int(word, 16)
+                bits.extend((col >> (GORILLA_SIZE - 1 - dy)) & 1 for dy in range(GORILLA_SIZE))
+            _gorilla_masks[pose] = bytes(bits)
+    return _gorilla_masks
+
+
+def max_buildings(width):
+    # Most buildings a skyline `width` pixels wide can hold: each takes at least 39 pixels
+    # and the last one starts more than 10 pixels before the edge (17 on one screen)
+    return -(-(width - 12) // 39)
+
+
+def generate_cities(rng, count, width=SCREEN_WIDTH):
+    # Generate `count` skylines at once with the original slope/height rules.
+    # rng is a numpy Generator. Returns (buildings, counts): a (count, max_buildings(width))
+    # building_dtype() array and how many leading records of each row are real buildings.
+    # width: skyline width in pixels; wider than the screen for scrolling battlefields.
+    import numpy as np
+
+    most = max_buildings(width)
+    slope = rng.integers(1, 7, size=(count, 1))
+    widths = rng.integers(37, 75, size=(count, most))
+    extra = rng.integers(0, 121, size=(count, most))
+    colors = np.array(BUILDING_COLORS, dtype=np.uint8)[rng.integers(0, 4, size=(count, most))]
+    lit = rng.integers(1, 5, size=(count, most, WINDOW_COLS, WINDOW_ROWS)) > 1
+
+    # Left edges: each building starts 2 pixels after the previous one ends
+    steps = np.cumsum(widths + 2, axis=1)
+    xs = np.empty_like(widths)
+    xs[:, 0] = 2
+    xs[:, 1:] = 2 + steps[:, :-1]
+    valid = xs < width - 10
+    widths = np.where(xs + widths > width, width - xs - 2, widths)
+
+    # Height trend: climb/fall steadily (slopes 1, 2), peak (3-5) or valley (6) mid-screen.
+    # A wide skyline repeats the trend every screen instead of running it off the clamps.
+    span = xs // SCREEN_WIDTH
+    right_half = xs % SCREEN_WIDTH > SCREEN_WIDTH // 2
+    delta = np.select(
+        [slope == 1, slope == 2, slope <= 5],
+        [10, -10, np.where(right_half, -20, 20)],
+        np.where(right_half, 20, -20))
+    trend = np.cumsum(delta, axis=1)
+    first = np.ones_like(valid)
+    first[:, 1:] = span[:, 1:] != span[:, :-1]
+    first = np.maximum.accumulate(np.where(first, np.arange(most), 0), axis=1)
+    trend -= np.take_along_axis(trend - delta, first, axis=1)
+    start = np.where((slope == 2) | (slope == 6), 130, 15)
+    heights = np.clip(extra + start + trend, 10, 200)
+
+    # Window slots exist while they fit inside the building with a 3 pixel border
+    col_ok = 3 + 10 * np.arange(WINDOW_COLS) < (widths - 3)[..., None]
+    row_ok = 3 + 15 * np.arange(WINDOW_ROWS) < (heights - 3)[..., None]
+    slots = col_ok[..., :, None] & row_ok[..., None, :]
+    windows = np.where(slots, np.where(lit, WINDOWCOLOR, DARK_WINDOWCOLOR), 0)
+
+    buildings = np.zeros((count, most), dtype=building_dtype())
+    buildings['x'] = xs
+    buildings['width'] = widths
+    buildings['height'] = heights
+    buildings['color'] = colors
+    buildings['windows'] = windows
+    buildings[~valid] = 0
+    return buildings, valid.sum(axis=1)
+
+
+def rasterize_city(buildings, out=None, city_width=SCREEN_WIDTH):
+    # Paint a city into a (city_width, SCREEN_HEIGHT) array of EGA color indices
+    # (0 = sky). Windows are written a whole building at a time through a strided view
+    # of the window grid instead of one draw call per window.
+    # out: optional reusable uint8 buffer of (city_width + RASTER_PAD, SCREEN_HEIGHT +
+    # RASTER_PAD), cleared and painted in place; the result is a view of it.
+    import numpy as np
+
+    if out is None:
+        pixels = np.zeros((city_width + RASTER_PAD, SCREEN_HEIGHT + RASTER_PAD),
+                          dtype=np.uint8)
+    else:
+        pixels = out
+        pixels.fill(0)
+    bottom = SCREEN_HEIGHT - CITY_BOTTOM
+
+    for bldg in buildings:
+        x, width, height = int(bldg['x']), int(bldg['width']), int(bldg['height'])
+        top = bottom - height
+        pixels[x:x + width, top:bottom] = bldg['color']
+
+        windows = bldg['windows']
+        cols = int(windows[:, 0].astype(bool).sum())
+        rows = int(windows[0, :].astype(bool).sum()) - 1  # bottom row is never lit
+        if cols <= 0 or rows <= 0:
+            continue
+        block = pixels[x + 3:x + 3 + 10 * cols, top + 3:top + 3 + 15 * rows]
+        block = block.reshape(cols, 10, rows, 15)
+        block[:, :3, :, :6] = windows[:cols, :rows][:, None, :, None]
+
+    return pixels[:city_width, :SCREEN_HEIGHT]
+
+
+def settle_columns(mask, colors, max_steps=None):
+    # Crumbling debris as a cellular automaton on [x, y] views of a city mask and its colors
+    # (rows from the top down to the street). Every step, each solid pixel with air right
+    # below it drops one row, taking its color along, until nothing is left hanging.
+    # Columns never affect each other, so any run of columns can be settled on its own.
+    # Modifies both in place. Returns True if pixels were still falling after max_steps.
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        falling = mask[:, :-1] & ~mask[:, 1:]
+        if not falling.any():
+            return False
+        colors[:, 1:][falling] = colors[:, :-1][falling]
+        mask[:, :-1] &= ~falling
+        mask[:, 1:] |= falling
+        steps += 1
+    return True
+
+
+def encode_damage(pristine, mask, colors):
+    # Damage to a city region as (destroyed, moved) bytes: a bit-packed mask of the pristine
+    # pixels that are gone, and, only once debris has fallen, a bit-packed mask of the
+    # pixels now holding something else followed by their colors
+    import numpy as np
+
+    destroyed = (pristine != 0) & ~mask
+    moved = mask & (colors != pristine)
+    if not moved.any():
+        return np.packbits(destroyed).tobytes(), b''
+    return np.packbits(destroyed).tobytes(), np.packbits(moved).tobytes() + colors[moved].tobytes()
+
+
+def decode_damage(mask, colors, destroyed, moved):
+    # Inverse of encode_damage, applied in place to the freshly rasterized mask and colors.
+    # Returns the destroyed-pixel mask.
+    import numpy as np
+
+    size = mask.size
+    gone = np.unpackbits(np.frombuffer(destroyed, dtype=np.uint8), count=size)
+    gone = gone.reshape(mask.shape).astype(bool)
+    mask &= ~gone
+    if moved:
+        bits = (size + 7) // 8
+        landed = np.unpackbits(np.frombuffer(moved, dtype=np.uint8, count=bits), count=size)
+        landed = landed.reshape(mask.shape).astype(bool)
+        mask |= landed
+        colors[landed] = np.frombuffer(moved, dtype=np.uint8, offset=bits)
+    return gone
+
+
+def crater_disc(radius):
+    # Boolean (2r+1, 2r+1) disc used to carve explosion holes into the city mask
+    disc = _crater_cache.get(radius)
+    if disc is None:
+        import numpy as np
+        d = np.arange(-radius, radius + 1)
+        disc = d[:, None] ** 2 + d[None, :] ** 2 <= radius * radius
+        _crater_cache[radius] = disc
+    return disc
+
+
+class NextRound:
+    # A round generated ahead of time by GorillasMatch.prepare_round, waiting for
+    # start_round to swap it in
+    def __init__(self, buildings, wind, gorilla_x, gorilla_y, pixels):
+        self.buildings = buildings
+        self.wind = wind
+        self.gorilla_x = gorilla_x
+        self.gorilla_y = gorilla_y
+        self.pixels = pixels  # the city rasterized into the spare buffer (None if wide)
+        self.surface = None  # a frontend's rendering of it
+
+
+class GorillasMatch:
+    def __init__(self, seed=None, num_players=2):
+        self.reseed(seed)
+
+        # Game state
+        self.num_games = 3
+        self.gravity = 9.8
+        self.buildings = []
+        self.city_mask = None  # solid city pixels, [x, y]
+        self.city_pixels = None  # EGA colors of the city as it stands, [x, y]
+        self.city_buffer = None  # raster buffer reused by every rebuild_city
+        self.spare_buffer = None  # ... and the one prepare_round renders the next city into
+        self.city_pristine = None  # city_pixels as generated, before any damage
+        self.damage_log = None  # craters of the round's city (gorillas_damage.DamageLog)
+        self.world_width = SCREEN_WIDTH  # wider makes a scrolling battlefield
+        self.world = None  # gorillas_world.ChunkedCity holding a wide city (else city_mask)
+        self.debris = False  # let what an explosion undercuts fall (settle_debris)
+        self.city_version = 0  # bumped whenever the city changes
+        self.wind = 0
+        self.sun_hit = False
+        self.cluster = 0  # fragments every banana bursts into at its apex (0 = plain bananas)
+        self.gorilla_masks = gorilla_masks()
+        self.gorilla_grid = {}  # (cell x, cell y) -> indices of gorillas whose box touches it
+        self.current_player = 0
+        self.replay = None  # inputs of the match in progress (gorillas_replay.Replay)
+        self.player_names = []
+        self.set_num_players(num_players)
+
+    def set_num_players(self, num_players):
+        # Size the per-player state for 2..MAX_PLAYERS players (scores start again at 0)
+        if not MIN_PLAYERS <= num_players <= MAX_PLAYERS:
+            raise ValueError(f"a match needs {MIN_PLAYERS} to {MAX_PLAYERS} players")
+        self.num_players = num_players
+        names = self.player_names
+        self.player_names = [names[i] if i < len(names) else "" for i in range(num_players)]
+        self.gorilla_x = [0] * num_players
+        self.gorilla_y = [0] * num_players
+        self.gorilla_facing = [1] * num_players  # +1 throws to the right, -1 to the left
+        self.scores = [0] * num_players
+        self.gorilla_alive = [True] * num_players
+        self.gorilla_pose = ['down'] * num_players  # sprite (and hit mask) each is shown with
+        self.gorilla_grid = {}
+
+    @property
+    def player1_name(self):
+        return self.player_names[0]
+
+    @player1_name.setter
+    def player1_name(self, name):
+        self.player_names[0] = name
+
+    @property
+    def player2_name(self):
+        return self.player_names[1]
+
+    @player2_name.setter
+    def player2_name(self, name):
+        self.player_names[1] = name
+
+    def set_world_width(self, width):
+        # Battlefield width in pixels. Anything wider than the screen is generated as a
+        # gorillas_world.ChunkedCity that is only rasterized where it is touched.
+        if not SCREEN_WIDTH <= width <= MAX_WORLD_WIDTH:
+            raise ValueError(f"the battlefield must be {SCREEN_WIDTH} to {MAX_WORLD_WIDTH} "
+                             f"pixels wide")
+        self.world_width = width
+
+    def reseed(self, seed=None):
+        # Start a reproducible match: all cityscape, wind and placement randomness comes
+        # from self.rng, so the same seed and shot inputs always replay the same game
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def draw_cityscape(self):
+        # Random skyline and wind for a round, as (buildings, wind)
+        import numpy as np
+
+        city_rng = np.random.default_rng(self.rng.getrandbits(64))
+        buildings, counts = generate_cities(city_rng, 1, self.world_width)
+        buildings = buildings[0, :counts[0]]
+
+        # Set wind
+        wind = self.rng.randint(-10, 10)
+        if self.rng.randint(1, 3) == 1:
+            if wind > 0:
+                wind += self.rng.randint(1, 10)
+            else:
+                wind -= self.rng.randint(1, 10)
+        return buildings, wind
+
+    def make_cityscape(self):
+        # Generate random cityscape
+        self.buildings, self.wind = self.draw_cityscape()
+        # Build damageable city for persistent building damage
+        self.rebuild_city()
+
+    def rebuild_city(self, prepared=None):
+        # Rasterize the pristine city; self.city_mask says which pixels are still solid.
+        # Returns the EGA color index array so a frontend can render it.
+        # Both the raster and the mask are reused from round to round.
+        # A wide battlefield is set up as chunks instead (nothing is rasterized yet) and
+        # None is returned. Either way the damage log starts afresh.
+        # prepared: a NextRound whose city is already rasterized; its buffer is swapped in.
+        import numpy as np
+        from gorillas_damage import DamageLog
+
+        buildings = np.ascontiguousarray(self.buildings, dtype=building_dtype())
+        self.damage_log = DamageLog(zlib.crc32(buildings.tobytes()))
+        if self.world_width > SCREEN_WIDTH:
+            from gorillas_world import ChunkedCity
+            self.world = ChunkedCity(self.buildings, self.world_width)
+            self.city_mask = self.city_pixels = self.city_pristine = None
+            self.city_version += 1
+            return None
+        self.world = None
+        if self.city_buffer is None:
+            self.city_buffer = np.empty((SCREEN_WIDTH + RASTER_PAD, SCREEN_HEIGHT + RASTER_PAD),
+                                        dtype=np.uint8)
+        if prepared is None:
+            pixels = rasterize_city(self.buildings, out=self.city_buffer)
+        else:
+            pixels = prepared.pixels
+            self.city_buffer, self.spare_buffer = self.spare_buffer, self.city_buffer
+        self.city_pixels = pixels
+        if self.city_pristine is None:
+            self.city_pristine = pixels.copy()
+        else:
+            np.copyto(self.city_pristine, pixels)
+        if self.city_mask is None:
+            self.city_mask = pixels != 0
+        else:
+            np.not_equal(pixels, 0, out=self.city_mask)
+        self.city_version += 1
+        return pixels
+
+    def draw_gorilla_spots(self, buildings):
+        # Random gorilla positions on a skyline, as (xs, ys)
+        if self.num_players == 2:
+            # Left gorilla on 2nd or 3rd building, right gorilla on 2nd or 3rd from end
+            indices = [self.rng.randint(1, 2), len(buildings) - self.rng.randint(2, 3)]
+        else:
+            # Free-for-all: split the skyline (minus the clipped last building) into one
+            # stretch per player and put each gorilla on a random building of its stretch.
+            # A city always has at least 9 buildings, so no two gorillas share one.
+            usable = len(buildings) - 1
+            n = self.num_players
+            indices = [self.rng.randint(k * usable // n, (k + 1) * usable // n - 1)
+                       for k in range(n)]
+        xs = [int(buildings[idx]['x'] + buildings[idx]['width'] // 2 - 15) for idx in indices]
+        ys = [int(SCREEN_HEIGHT - CITY_BOTTOM - buildings[idx]['height'] - 30)
+              for idx in indices]
+        return xs, ys
+
+    def place_gorillas(self):
+        # Place gorillas on buildings
+        xs, ys = self.draw_gorilla_spots(self.buildings)
+        self.gorilla_x[:] = xs
+        self.gorilla_y[:] = ys
+        self.index_gorillas()
+
+    def index_gorillas(self):
+        # Rebuild the uniform grid of gorilla boxes (and which way each gorilla throws).
+        # Must be called whenever gorillas move; check_collision only looks in the grid.
+        if self.num_players == 2:
+            self.gorilla_facing = [1, -1]
+        else:
+            self.gorilla_facing = [1 if x + GORILLA_SIZE // 2 < self.world_width // 2 else -1
+                                   for x in self.gorilla_x]
+        grid = {}
+        for i in range(self.num_players):
+            gx, gy = self.gorilla_x[i], self.gorilla_y[i]
+            for cx in range(gx // GRID_CELL, (gx + GORILLA_SIZE) // GRID_CELL + 1):
+                for cy in range(gy // GRID_CELL, (gy + GORILLA_SIZE) // GRID_CELL + 1):
+                    grid[cx, cy] = grid.get((cx, cy), ()) + (i,)
+        self.gorilla_grid = grid
+
+    def prepare_round(self):
+        # Generate the next round (skyline, wind, gorilla spots, rasterized city) without
+        # touching the one in play, so a frontend can run it on a worker thread while the
+        # last round's animation plays. It draws from self.rng exactly as start_round would,
+        # so nothing else may use the rng until start_round(prepared) swaps it in.
+        import numpy as np
+
+        buildings, wind = self.draw_cityscape()
+        xs, ys = self.draw_gorilla_spots(buildings)
+        pixels = None
+        if self.world_width == SCREEN_WIDTH:
+            if self.spare_buffer is None:
+                self.spare_buffer = np.empty((SCREEN_WIDTH + RASTER_PAD,
+                                              SCREEN_HEIGHT + RASTER_PAD), dtype=np.uint8)
+            pixels = rasterize_city(buildings, out=self.spare_buffer)
+        return NextRound(buildings, wind, xs, ys, pixels)
+
+    def start_round(self, prepared=None):
+        # Fresh city, wind and gorillas for a new round (prepared: a NextRound from
+        # prepare_round to swap in instead of generating one now)
+        if prepared is None:
+            self.make_cityscape()
+            self.place_gorillas()
+        else:
+            self.buildings, self.wind = prepared.buildings, prepared.wind
+            self.rebuild_city(prepared)
+            self.gorilla_x[:] = prepared.gorilla_x
+            self.gorilla_y[:] = prepared.gorilla_y
+            self.index_gorillas()
+        self.gorilla_alive = [True] * self.num_players
+        self.sun_hit = False
+
+    def in_gorilla_box(self, i, x, y):
+        # Cheap bounding-box test against gorilla i
+        gx = self.gorilla_x[i]
+        gy = self.gorilla_y[i]
+        return gx <= x <= gx + GORILLA_SIZE and gy <= y <= gy + GORILLA_SIZE
+
+    def check_collision(self, x, y, shooter=None):
+        # Check if shot hits building or gorilla
+        # Check gorillas: only those indexed in this grid cell, box pre-check, then a
+        # lookup in the pose's pixel mask
+        for i in self.gorilla_grid.get((int(x // GRID_CELL), int(y // GRID_CELL)), ()):
+            # Ignore collision with the gorilla who just threw the banana, and with
+            # gorillas already knocked out this round
+            if (shooter is not None and i == shooter) or not self.gorilla_alive[i]:
+                continue
+            if self.in_gorilla_box(i, x, y):
+                dx = int(x) - self.gorilla_x[i]
+                dy = int(y) - self.gorilla_y[i]
+                if (dx < GORILLA_SIZE and dy < GORILLA_SIZE and
+                        self.gorilla_masks[self.gorilla_pose[i]][dx * GORILLA_SIZE + dy]):
+                    return 'gorilla', i
+        # Check buildings (pixel-accurate against the damageable city mask)
+        ix, iy = int(x), int(y)
+        if self.world is not None:
+            if self.world.solid(ix, iy):
+                return 'building', None
+        elif self.city_mask is not None and 0 <= ix < SCREEN_WIDTH and 0 <= iy < SCREEN_HEIGHT:
+            if self.city_mask[ix, iy]:
+                return 'building', None
+        elif self.city_mask is None:
+            # Fallback: rectangle tests
+            for bldg in self.buildings:
+                bottom = SCREEN_HEIGHT - 5
+                top = bottom - bldg['height']
+                if (bldg['x'] <= x <= bldg['x'] + bldg['width'] and
+                    top <= y <= bottom):
+                    return 'building', None
+
+        # Check sun (in the middle of the battlefield)
+        cx = self.world_width // 2
+        cy = 40
+        if math.sqrt((x - cx)**2 + (y - cy)**2) < 12:
+            return 'sun', None
+
+        return None, None
+
+    def shot_start(self, player_num, angle, velocity):
+        # Launch point and initial velocity of a throw (angle is mirrored for gorillas
+        # facing left)
+        facing = self.gorilla_facing[player_num]
+        if facing < 0:
+            angle = 180 - angle
+
+        angle_rad = math.radians(angle)
+
+        start_x = self.gorilla_x[player_num] + (25 if facing > 0 else 5)
+        start_y = self.gorilla_y[player_num] + 8
+
+        init_xvel = math.cos(angle_rad) * velocity
+        init_yvel = math.sin(angle_rad) * velocity
+        return start_x, start_y, init_xvel, init_yvel
+
+    def trace_shot(self, player_num, angle, velocity):
+        # Step a banana through the world, yielding (t, x, y, coll_type, coll_data) each step.
+        # Shared by the animated and simulated throws so both follow the same flight and
+        # collision rules. Stops when the banana leaves the world; the caller decides what
+        # a hit does.
+        start_x, start_y, init_xvel, init_yvel = self.shot_start(player_num, angle, velocity)
+
+        t = 0.0
+        left_shooter = False  # has banana ever left the thrower's hitbox?
+
+        while True:
+            x = start_x + (init_xvel * t) + (0.5 * (self.wind / 5) * t * t)
+            y = start_y + ((-1 * init_yvel * t) + (0.5 * self.gravity * t * t)) * (SCREEN_HEIGHT / 350)
+
+            if (x < -WORLD_MARGIN_X or x > self.world_width + WORLD_MARGIN_X or
+                y > SCREEN_HEIGHT + WORLD_MARGIN_Y or t > MAX_SHOT_T):
+                return
+
+            ix, iy = int(x), int(y)
+
+            # Once banana is outside the shooter's rectangle, allow self-hit
+            if not self.in_gorilla_box(player_num, ix, iy):
+                left_shooter = True
+
+            coll_type, coll_data = None, None
+
+            # Only collide when it's actually inside the battlefield
+            if 0 <= ix < self.world_width and 0 <= iy < SCREEN_HEIGHT:
+                # Only ignore shooter BEFORE it has left the shooter hitbox
+                shooter_to_ignore = player_num if not left_shooter else None
+                coll_type, coll_data = self.check_collision(ix, iy, shooter=shooter_to_ignore)
+
+            yield t, x, y, coll_type, coll_data
+            t += SHOT_DT
+
+    def carve_city(self, x, y, radius=CRATER_RADIUS):
+        # Punch an explosion hole into the city mask (and log it in damage_log).
+        # Returns the clipped (x0, x1, y0, y1, disc) that was carved, or None.
+        ix, iy = int(x), int(y)
+        if self.world is not None:
+            carved = self.world.carve(ix, iy, radius)
+        elif self.city_mask is None:
+            return None
+        else:
+            carved = None
+            x0, x1 = max(0, ix - radius), min(SCREEN_WIDTH, ix + radius + 1)
+            y0, y1 = max(0, iy - radius), min(SCREEN_HEIGHT, iy + radius + 1)
+            if x0 < x1 and y0 < y1:
+                disc = crater_disc(radius)[x0 - ix + radius:x1 - ix + radius,
+                                           y0 - iy + radius:y1 - iy + radius]
+                self.city_mask[x0:x1, y0:y1] &= ~disc
+                carved = x0, x1, y0, y1, disc
+        if carved is None:
+            return None
+        if self.damage_log is not None:
+            self.damage_log.record(ix, iy, radius)
+        self.city_version += 1
+        return carved
+
+    def settle_debris(self, x0, x1, max_steps=None):
+        # Let the city pixels left hanging in columns x0..x1 fall (see settle_columns);
+        # collisions see the result at once. Returns True while debris is still falling.
+        if self.world is not None:
+            falling = self.world.settle(x0, x1, max_steps)
+        elif self.city_mask is not None:
+            bottom = SCREEN_HEIGHT - CITY_BOTTOM
+            falling = settle_columns(self.city_mask[x0:x1, :bottom],
+                                     self.city_pixels[x0:x1, :bottom], max_steps)
+        else:
+            return False
+        self.city_version += 1
+        return falling
+
+    def mark_shot(self):
+        # A throw starts: mark it in the damage log so the city can be rewound to this point
+        # (taking a checkpoint of the city when one is due)
+        if self.damage_log is not None:
+            self.damage_log.mark_shot(lambda: self.city_state()[1:])
+
+    def rewind_city(self, shot):
+        # Put the city back the way it stood when throw `shot` of the round started: load
+        # the nearest checkpoint and redo the craters (and their debris) logged since.
+        # Later throws are dropped from the log.
+        import numpy as np
+
+        log = self.damage_log
+        count = log.shots[shot]
+        start, state = log.checkpoint_before(count)
+        redo = log.ops[start:count]
+        log.truncate(shot)
+        if state is None:
+            self.rebuild_city()
+        else:
+            buildings = np.ascontiguousarray(self.buildings, dtype=building_dtype())
+            self.load_city_state(buildings.tobytes(), *state)
+        self.damage_log = None  # don't log the craters again while redoing them
+        try:
+            for x, y, radius in redo:
+                carved = self.carve_city(x, y, radius)
+                if carved is not None and self.debris:
+                    self.settle_debris(carved[0], carved[1])
+        finally:
+            self.damage_log = log
+
+    def simulate_shot(self, player_num, angle, velocity, max_steps=None):
+        # A throw without drawing or waiting: same flight, damage and hit rules as plot_shot.
+        # Returns (hit_player, impact, x, y) where impact is 'gorilla', 'building' or 'miss'
+        # and x, y is the last banana position. max_steps replays a throw that was cancelled.
+        self.mark_shot()
+        x, y = None, None
+        for step, (t, x, y, coll_type, coll_data) in enumerate(
+                self.trace_shot(player_num, angle, velocity)):
+            if max_steps is not None and step >= max_steps:
+                break
+            if coll_type == 'sun':
+                self.sun_hit = True
+            elif coll_type == 'building':
+                carved = self.carve_city(x, y)
+                if carved is not None and self.debris:
+                    self.settle_debris(carved[0], carved[1])
+                return None, 'building', x, y
+            elif coll_type == 'gorilla':
+                self.gorilla_alive[coll_data] = False
+                return coll_data, 'gorilla', x, y
+        return None, 'miss', x, y
+
+    def simulate_throw(self, player_num, angle, velocity, max_steps=None):
+        # One turn's throw under this match's rules: a plain banana, or with self.cluster
+        # a cluster banana flown by gorillas_projectiles. Returns the gorillas hit, in order.
+        if self.cluster:
+            from gorillas_projectiles import simulate_volley
+            return simulate_volley(self, player_num, angle, velocity, self.cluster, max_steps)
+        hit_player = self.simulate_shot(player_num, angle, velocity, max_steps)[0]
+        return [] if hit_player is None else [hit_player]
+
+    def award_hits(self, current_player, hits):
+        # award_point for every gorilla a throw hit until one of them decides the round.
+        # Returns the round's winner or None.
+        for hit_player in hits:
+            winner = self.award_point(current_player, hit_player)
+            if winner is not None:
+                return winner
+        return None
+
+    def award_point(self, current_player, hit_player):
+        # Knock out the hit gorilla. Once only one is left standing it wins the round's
+        # point and is returned; until then None (with two players hitting yourself gives
+        # the point away, as in the original).
+        self.gorilla_alive[hit_player] = False
+        standing = [i for i, alive in enumerate(self.gorilla_alive) if alive]
+        if len(standing) != 1:
+            return None
+        winner = standing[0]
+        self.scores[winner] += 1
+        return winner
+
+    def next_player(self, player, round_over=False):
+        # Whose turn follows `player`: the next gorilla still standing, or simply the next
+        # in order once the round is over (everyone is back for the new round)
+        n = self.num_players
+        if round_over:
+            return (player + 1) % n
+        for step in range(1, n + 1):
+            if self.gorilla_alive[(player + step) % n]:
+                return (player + step) % n
+        return (player + 1) % n
+
+    def match_over(self):
+        return max(self.scores) >= self.num_games
+
+    def city_state(self):
+        # Compact city for snapshots: raw building records plus the damage against the
+        # pristine city (re-rendered from the records on load; see encode_damage)
+        import numpy as np
+
+        buildings = np.ascontiguousarray(self.buildings, dtype=building_dtype())
+        if self.world is not None:
+            return buildings.tobytes(), self.world.state(), b''
+        if self.city_mask is None:
+            pristine = rasterize_city(buildings)
+            return buildings.tobytes(), np.packbits(pristine != 0).tobytes(), b''
+        damage, moved = encode_damage(self.city_pristine, self.city_mask, self.city_pixels)
+        return buildings.tobytes(), damage, moved
+
+    def load_city_state(self, buildings, damage, moved=b'', log=None):
+        # Inverse of city_state: rebuild the pristine city and apply the damage.
+        # log: the damage log that led there (DamageLog.to_bytes); without it the loaded
+        # city starts a log of its own, with unknown history.
+        # Returns the destroyed-pixel mask (None for a wide battlefield).
+        import numpy as np
+        from gorillas_damage import DamageLog
+
+        self.buildings = np.frombuffer(buildings, dtype=building_dtype()).copy()
+        self.rebuild_city()
+        if log:
+            self.damage_log.load_bytes(log)
+            self.damage_log.checkpoints[len(self.damage_log)] = (damage, moved)
+        else:
+            origin = zlib.crc32(moved, zlib.crc32(damage, self.damage_log.origin))
+            self.damage_log = DamageLog(origin, (damage, moved))
+        if self.world is not None:
+            self.world.load_state(damage)
+            return None
+        return decode_damage(self.city_mask, self.city_pixels, damage, moved)
+
+    def city_digest(self):
+        # CRC32 of the skyline and the damage log: two matches on the same seed agree on it
+        # exactly when the same craters went into their cities, without comparing pixels
+        return 0 if self.damage_log is None else self.damage_log.digest()
+
+    def city_checksum(self):
+        # CRC32 of the damaged city, used to verify replays bit-for-bit
+        if self.world is not None:
+            return self.world.checksum()
+        if self.city_mask is None:
+            return 0
+        import numpy as np
+        return zlib.crc32(np.packbits(self.city_mask).tobytes())
@@ -0,0 +1,102 @@
+# Damage log of the city in play (GorillasMatch.damage_log).
+# Every crater carved into a round's city is logged as one compact operation (x, y, radius)
+# on top of the generated skyline, and the start of every throw is marked. The city as it
+# stands is the pristine render with the logged craters (and, with debris on, the settling
+# after each) applied in order, so
+#   * rewinding to the start of any throw of the round loads the nearest checkpoint at or
+#     before it and redoes the few craters since (GorillasMatch.rewind_city); a checkpoint
+#     (the city's encode_damage bytes) is taken at a throw once CHECKPOINT_OPS craters have
+#     been logged since the last one, so a rewind never redoes many more than that
+#   * two matches on the same skyline can be compared by a running CRC of their logs
+#     (digest) instead of a pixel diff of the whole city
+#   * the log travels with snapshots, so a restored match keeps its history
+
+import struct
+import zlib
+
+CHECKPOINT_OPS = 8
+# crater centre x, y (battlefield pixels) and radius
+OP = struct.Struct('<ihB')
+# origin, whether the log starts from a loaded city (base), number of craters, of throws
+COUNTS = struct.Struct('<I?II')
+# sizes of the base city's damage and moved blobs
+BASE = struct.Struct('<II')
+
+
+class DamageLog:
+    def __init__(self, origin=0, base=None):
+        # origin: CRC32 identifying the skyline (and the damage it started from).
+        # base: (damage, moved) of a city that was loaded with unknown history, or None
+        # for a pristine one.
+        self.origin = origin
+        self.ops = []     # (x, y, radius) per crater, in order
+        self.shots = []   # len(ops) when each throw of the round started
+        self.checkpoints = {0: base}  # len(ops) -> (damage, moved) of the city at that point
+        self.crc = origin
+
+    def __len__(self):
+        return len(self.ops)
+
+    def record(self, x, y, radius):
+        op = (int(x), int(y), int(radius))
+        self.ops.append(op)
+        self.crc = zlib.crc32(OP.pack(*op), self.crc)
+
+    def checkpoint_due(self):
+        return len(self.ops) - max(self.checkpoints) >= CHECKPOINT_OPS
+
+    def mark_shot(self, city_state=None):
+        # A throw starts now. city_state() returns the city's (damage, moved); it is only
+        # called when a checkpoint is due.
+        count = len(self.ops)
+        if city_state is not None and self.checkpoint_due():
+            self.checkpoints[count] = city_state()
+        self.shots.append(count)
+
+    def checkpoint_before(self, count):
+        # The latest checkpoint at or before `count` craters
+        start = max(k for k in self.checkpoints if k <= count)
+        return start, self.checkpoints[start]
+
+    def truncate(self, shot):
+        # Forget throw `shot` and everything after it (the city is being rewound there).
+        # Returns the number of craters kept.
+        count = self.shots[shot]
+        del self.ops[count:]
+        del self.shots[shot:]
+        for k in [k for k in self.checkpoints if k > count]:
+            del self.checkpoints[k]
+        self.crc = zlib.crc32(b''.join(OP.pack(*op) for op in self.ops), self.origin)
+        return count
+
+    def digest(self):
+        # CRC32 of the skyline and every crater on it, kept up to date as craters are logged
+        return self.crc
+
+    def to_bytes(self):
+        # Origin, craters and throw marks, for snapshots, plus the base city of a log that
+        # did not start from the pristine skyline (later checkpoints are rebuilt, not stored)
+        base = self.checkpoints[0]
+        parts = [COUNTS.pack(self.origin, base is not None, len(self.ops), len(self.shots)),
+                 *(OP.pack(*op) for op in self.ops),
+                 struct.pack(f'<{len(self.shots)}I', *self.shots)]
+        if base is not None:
+            parts += [BASE.pack(len(base[0]), len(base[1])), base[0], base[1]]
+        return b''.join(parts)
+
+    def load_bytes(self, data):
+        # Inverse of to_bytes; the checkpoints after the base are dropped
+        self.origin, based, num_ops, num_shots = COUNTS.unpack_from(data, 0)
+        offset = COUNTS.size
+        self.ops = [OP.unpack_from(data, offset + i * OP.size) for i in range(num_ops)]
+        offset += num_ops * OP.size
+        self.shots = list(struct.unpack_from(f'<{num_shots}I', data, offset))
+        offset += num_shots * 4
+        base = None
+        if based:
+            damage_size, moved_size = BASE.unpack_from(data, offset)
+            offset += BASE.size
+            base = (bytes(data[offset:offset + damage_size]),
+                    bytes(data[offset + damage_size:offset + damage_size + moved_size]))
+        self.checkpoints = {0: base}
+        self.crc = zlib.crc32(b''.join(OP.pack(*op) for op in self.ops), self.origin)
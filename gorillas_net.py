@@ -0,0 +1,398 @@
+# Networked two-player Gorillas over asyncio.
+# The server owns the authoritative match (gorillas_core.GorillasMatch). Clients only send
+# the angle/velocity of their own throws; the server answers every throw with a small
+# RESULT message that both clients replay locally. Because the match is seeded and the
+# rules are deterministic, each client simulates the same flight and damage from a few
+# bytes per turn, and the city digest in every result (a CRC of the damage log, see
+# GorillasMatch.city_digest) catches any desync.
+#
+#   python gorillas_net.py serve --port 5151          # authoritative server
+#   python GORILLAS_BAS.py --connect localhost:5151   # a player (twice)
+#   python gorillas_net.py selftest                   # loopback match with scripted clients
+#
+# Matches can also be watched live; see gorillas_spectate.py.
+
+import asyncio
+import queue
+import random
+import struct
+import threading
+
+from gorillas_core import MAX_POINTS, GorillasMatch
+from gorillas_replay import Replay
+from gorillas_snapshot import take_snapshot
+
+DEFAULT_PORT = 5151
+
+# Every message is a 2-byte length, a 1-byte type and a type-specific body
+LENGTH = struct.Struct('<H')
+HELLO = b'H'    # client name (utf-8)
+WELCOME = b'W'  # your index, seed, gravity, points to win, then both names
+TURN = b'T'     # whose turn it is
+SHOT = b'S'     # angle, velocity of the sender's throw
+RESULT = b'R'   # thrower, angle, velocity, hit gorilla (-1 none), scores, city digest
+OVER = b'O'     # final scores
+
+WELCOME_BODY = struct.Struct('<BQdH')
+TURN_BODY = struct.Struct('<B')
+SHOT_BODY = struct.Struct('<dd')
+RESULT_BODY = struct.Struct('<BddbHHI')
+OVER_BODY = struct.Struct('<HH')
+NAME = struct.Struct('<B')
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class DesyncError(Exception):
+    pass
+
+
+def _pack_name(name):
+    data = name.encode('utf-8')[:255]
+    return NAME.pack(len(data)) + data
+
+
+def _unpack_name(data, offset):
+    (size,) = NAME.unpack_from(data, offset)
+    offset += NAME.size
+    return data[offset:offset + size].decode('utf-8'), offset + size
+
+
+async def send_msg(writer, kind, body=b''):
+    writer.write(LENGTH.pack(len(body) + 1) + kind + body)
+    await writer.drain()
+
+
+async def read_msg(reader):
+    # Returns (kind, body); raises asyncio.IncompleteReadError when the peer goes away
+    (size,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    data = await reader.readexactly(size)
+    return data[:1], data[1:]
+
+
+class GorillasServer:
+    # Runs one match between the first two clients that connect.
+    # spectators: optional gorillas_spectate.SpectatorHub to stream the match to
+    def __init__(self, seed=None, gravity=9.8, num_games=3, spectators=None):
+        self.match = GorillasMatch(seed)
+        self.match.gravity = gravity
+        self.match.num_games = num_games
+        self.match.replay = Replay(self.match.seed, gravity, num_games)
+        self.spectators = spectators
+        self.players = []  # (reader, writer, name)
+        self.joined = asyncio.Event()
+        self.finished = asyncio.Event()
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.server = await asyncio.start_server(self._on_connect, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for reader, writer, name in self.players:
+            writer.close()
+
+    async def _on_connect(self, reader, writer):
+        if len(self.players) >= 2:
+            writer.close()
+            return
+        kind, body = await read_msg(reader)
+        if kind != HELLO:
+            writer.close()
+            return
+        name = body.decode('utf-8')[:10] or f"Player {len(self.players) + 1}"
+        self.players.append((reader, writer, name))
+        if len(self.players) == 2:
+            self.joined.set()
+
+    async def broadcast(self, kind, body=b''):
+        for reader, writer, name in self.players:
+            await send_msg(writer, kind, body)
+
+    async def serve_match(self):
+        # Same round/turn/scoring flow as QBasicGorillas.play_game
+        await self.joined.wait()
+        match = self.match
+        match.player1_name = self.players[0][2]
+        match.player2_name = self.players[1][2]
+        names = _pack_name(match.player1_name) + _pack_name(match.player2_name)
+        for index, (reader, writer, name) in enumerate(self.players):
+            await send_msg(writer, WELCOME, WELCOME_BODY.pack(
+                index, match.seed, match.gravity, match.num_games) + names)
+
+        try:
+            match.current_player = 0
+            while match.scores[0] < match.num_games and match.scores[1] < match.num_games:
+                match.start_round()
+                hit = False
+                while not hit:
+                    player = match.current_player
+                    if self.spectators is not None:
+                        self.spectators.sync(take_snapshot(match))
+                    await self.broadcast(TURN, TURN_BODY.pack(player))
+                    kind, body = await read_msg(self.players[player][0])
+                    if kind != SHOT:
+                        raise ProtocolError(f"expected a shot, got {kind!r}")
+                    angle, velocity = SHOT_BODY.unpack(body)
+
+                    hit_player, impact, x, y = match.simulate_shot(player, angle, velocity)
+                    match.replay.record_shot(angle, velocity)
+                    if hit_player is not None:
+                        hit = True
+                        match.award_point(player, hit_player)
+                    match.sun_hit = False
+                    match.current_player = 1 - player
+                    city_crc = match.city_digest()
+                    await self.broadcast(RESULT, RESULT_BODY.pack(
+                        player, angle, velocity, -1 if hit_player is None else hit_player,
+                        match.scores[0], match.scores[1], city_crc))
+                    if self.spectators is not None:
+                        self.spectators.publish_shot(player, angle, velocity, hit_player,
+                                                     impact, x, y, match.scores, city_crc)
+
+            match.replay.finish(match.scores, match.city_checksum())
+            await self.broadcast(OVER, OVER_BODY.pack(*match.scores))
+            if self.spectators is not None:
+                self.spectators.publish_over(match.scores)
+        finally:
+            self.finished.set()
+
+
+class GorillasClient:
+    # Lockstep client: keeps its own GorillasMatch in step with the server by replaying
+    # every RESULT locally. Its shots come from `shooter`, a callable(match, player) ->
+    # (angle, velocity) that may also be a coroutine function, or from a subclass's
+    # choose_shot; the on_* hooks react to events. With auto_shoot off, shots are sent
+    # with send_shot from outside instead (a frontend asking the player).
+    auto_shoot = True
+
+    def __init__(self, name="Player", shooter=None):
+        if (shooter is None and self.auto_shoot and
+                type(self).choose_shot is GorillasClient.choose_shot):
+            raise TypeError("a client that shoots by itself needs a shooter")
+        self.name = name
+        self.shooter = shooter
+        self.match = None
+        self.index = None
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        await send_msg(self.writer, HELLO, self.name.encode('utf-8'))
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    async def send_shot(self, angle, velocity):
+        await send_msg(self.writer, SHOT, SHOT_BODY.pack(angle, velocity))
+
+    async def run(self):
+        # Process server messages until the match is over; returns the final scores
+        while True:
+            kind, body = await read_msg(self.reader)
+            if kind == WELCOME:
+                self.index, seed, gravity, num_games = WELCOME_BODY.unpack_from(body, 0)
+                name1, offset = _unpack_name(body, WELCOME_BODY.size)
+                name2, offset = _unpack_name(body, offset)
+                self.match = GorillasMatch(seed)
+                self.match.gravity = gravity
+                self.match.num_games = num_games
+                self.match.player1_name = name1
+                self.match.player2_name = name2
+                self.match.start_round()
+                await self.on_welcome()
+            elif kind == TURN:
+                (player,) = TURN_BODY.unpack(body)
+                await self.on_turn(player)
+                if player == self.index and self.auto_shoot:
+                    angle, velocity = await self.choose_shot()
+                    await self.send_shot(angle, velocity)
+            elif kind == RESULT:
+                self.apply_result(*RESULT_BODY.unpack(body))
+            elif kind == OVER:
+                scores = OVER_BODY.unpack(body)
+                await self.on_over(scores)
+                return scores
+            else:
+                raise ProtocolError(f"unexpected message {kind!r}")
+
+    def apply_result(self, player, angle, velocity, hit, score0, score1, city_crc):
+        # Replay the throw locally and check we still agree with the server
+        match = self.match
+        hit_player, impact, x, y = match.simulate_shot(player, angle, velocity)
+        if hit_player is not None:
+            match.award_point(player, hit_player)
+        match.sun_hit = False
+        match.current_player = 1 - player
+        if ((-1 if hit_player is None else hit_player) != hit or
+                list(match.scores) != [score0, score1] or match.city_digest() != city_crc):
+            raise DesyncError("local simulation no longer matches the server")
+        self.on_result(player, angle, velocity, hit_player, x, y)
+        if hit_player is not None and max(match.scores) < match.num_games:
+            match.start_round()
+
+    async def choose_shot(self):
+        # Our turn: ask the shooter
+        shot = self.shooter(self.match, self.index)
+        if asyncio.iscoroutine(shot):
+            shot = await shot
+        return shot
+
+    async def on_welcome(self):
+        pass
+
+    async def on_turn(self, player):
+        pass
+
+    def on_result(self, player, angle, velocity, hit_player, x, y):
+        pass
+
+    async def on_over(self, scores):
+        pass
+
+
+class ScriptedClient(GorillasClient):
+    # Stand-in for a remote player: throws from a fixed list, or, once that runs out,
+    # with the tournament's simple AI aiming from the client's own copy of the match.
+    # delay: seconds to "think" before each throw
+    def __init__(self, name="Bot", shots=(), seed=0, delay=0.0):
+        super().__init__(name)
+        from gorillas_tournament import AIPlayer
+        self.shots = list(shots)
+        self.ai = AIPlayer(random.Random(seed))
+        self.round_scores = None
+        self.delay = delay
+
+    async def choose_shot(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.round_scores != sum(self.match.scores):
+            self.round_scores = sum(self.match.scores)
+            self.ai.reset()
+        if self.shots:
+            return self.shots.pop(0)
+        return self.ai.choose()
+
+    def on_result(self, player, angle, velocity, hit_player, x, y):
+        if player == self.index and hit_player is None:
+            match = self.match
+            self.ai.observe(match.gorilla_x[player], match.gorilla_x[1 - player], x)
+
+
+class NetworkSession:
+    # Bridges a pygame frontend to the asyncio client: the client runs on a background
+    # thread and hands results to the game loop through a queue
+    def __init__(self, host, port, name):
+        self.results = queue.Queue()
+        self.client = _RelayClient(name, self.results)
+        self.loop = asyncio.new_event_loop()
+        self.welcomed = threading.Event()
+        self.client.welcomed = self.welcomed
+        self.thread = threading.Thread(target=self._run, args=(host, port), daemon=True)
+        self.thread.start()
+
+    def _run(self, host, port):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.client.connect(host, port))
+            self.loop.run_until_complete(self.client.run())
+        except Exception as exc:
+            self.results.put(('error', exc))
+            self.welcomed.set()
+
+    def send_shot(self, angle, velocity):
+        asyncio.run_coroutine_threadsafe(self.client.send_shot(angle, velocity), self.loop)
+
+
+class _RelayClient(GorillasClient):
+    auto_shoot = False
+
+    def __init__(self, name, results):
+        super().__init__(name)
+        self.results = results
+        self.welcomed = None
+
+    async def on_welcome(self):
+        self.welcomed.set()
+
+    def on_result(self, player, angle, velocity, hit_player, x, y):
+        self.results.put(('result', (player, angle, velocity)))
+
+    async def on_over(self, scores):
+        self.results.put(('over', scores))
+
+
+async def run_loopback_match(seed=0, gravity=9.8, num_games=3, shots=((), ())):
+    # Server plus two scripted clients over localhost; returns (server match, clients)
+    server = GorillasServer(seed, gravity, num_games)
+    port = await server.start('127.0.0.1', 0)
+    clients = [ScriptedClient("Alice", shots[0], seed=1), ScriptedClient("Bob", shots[1], seed=2)]
+    try:
+        for client in clients:
+            await client.connect('127.0.0.1', port)
+            # Connect in order so the first client is player 1
+            while len(server.players) < clients.index(client) + 1:
+                await asyncio.sleep(0)
+        await asyncio.gather(server.serve_match(), *(client.run() for client in clients))
+    finally:
+        for client in clients:
+            await client.close()
+        await server.close()
+    return server.match, clients
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Networked Gorillas")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="run an authoritative match server")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--seed", type=int, default=None)
+    serve.add_argument("--gravity", type=float, default=9.8)
+    serve.add_argument("--points", type=int, default=3)
+    serve.add_argument("--spectators", type=int, default=None, metavar="PORT",
+                       help="also stream the match to viewers on this port")
+    serve.add_argument("--record", default=None, help="save a replay of the match to this file")
+    selftest = sub.add_parser("selftest", help="play a loopback match with scripted clients")
+    selftest.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.command == "serve" and not 1 <= args.points <= MAX_POINTS:
+        parser.error(f"--points must be 1 to {MAX_POINTS}")
+
+    if args.command == "serve":
+        async def serve_forever():
+            hub = None
+            if args.spectators is not None:
+                from gorillas_spectate import SpectatorHub
+                hub = SpectatorHub()
+                print(f"Spectators can watch on port {await hub.start(args.host, args.spectators)}")
+            server = GorillasServer(args.seed, args.gravity, args.points, spectators=hub)
+            port = await server.start(args.host, args.port)
+            print(f"Waiting for two players on port {port} (seed {server.match.seed})")
+            await server.serve_match()
+            print(f"Final score {server.match.scores[0]}-{server.match.scores[1]}")
+            if args.record:
+                server.match.replay.save(args.record)
+            await server.close()
+            if hub is not None:
+                await hub.close()
+        asyncio.run(serve_forever())
+        return 0
+
+    match, clients = asyncio.run(run_loopback_match(args.seed))
+    print(f"Loopback match finished {match.scores[0]}-{match.scores[1]}; both clients in sync: "
+          f"{all(c.match.city_checksum() == match.city_checksum() for c in clients)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,223 @@
+# Many bananas in flight at once, stepped together as NumPy arrays.
+# A Volley holds every projectile's launch point, launch velocity and flight time in flat
+# arrays, so a step computes all positions with the same closed-form flight as
+# GorillasMatch.trace_shot, then resolves the gorilla, building, sun and off-world tests for
+# the whole batch with array operations. Only the few projectiles that actually land fall
+# back to Python (to carve their crater and report the impact).
+#
+# Cluster bananas are built on this: a banana launched with split=N bursts into N
+# fragments at the top of its flight. The same Volley can carry throws from several
+# gorillas at once (launch() once per thrower).
+#
+#   volley = Volley(match)
+#   volley.launch(player, angle, velocity, split=5)
+#   while volley.active():
+#       for index, impact, x, y, gorilla in volley.step():
+#           ...
+
+import math
+
+import numpy as np
+
+from gorillas_core import (
+    GORILLA_SIZE, MAX_SHOT_T, SCREEN_HEIGHT, SHOT_DT, WORLD_MARGIN_X, WORLD_MARGIN_Y,
+)
+
+SPLIT_SPREAD = 30.0  # degrees either side of the banana's heading that fragments fan out
+MAX_SPLIT = 16
+SUN_Y = 40
+SUN_RADIUS = 12
+
+_FIELDS = (
+    ('x0', np.float64), ('y0', np.float64),  # launch point
+    ('vx', np.float64), ('vy', np.float64),  # launch velocity (vy > 0 is upwards)
+    ('t', np.float64),                       # flight time of the next step
+    ('x', np.float64), ('y', np.float64),    # position at the last step
+    ('owner', np.int8),                      # gorilla that threw it
+    ('split', np.int8),                      # fragments it bursts into at its apex
+    ('alive', np.bool_),
+    ('left_owner', np.bool_),                # has it ever left the thrower's box?
+)
+
+
+class Volley:
+    def __init__(self, match, capacity=64):
+        self.match = match
+        self.count = 0  # slots used so far; dead projectiles keep their slot
+        self.steps = 0
+        self.hits = []  # gorillas hit, in the order they were hit
+        self._allocate(capacity)
+        masks = match.gorilla_masks
+        self.masks = {pose: np.frombuffer(bytes(masks[pose]), dtype=np.uint8).astype(bool)
+                      for pose in masks}
+
+    def _allocate(self, capacity):
+        old = {name: getattr(self, name) for name, _ in _FIELDS} if self.count else {}
+        for name, dtype in _FIELDS:
+            array = np.zeros(capacity, dtype=dtype)
+            if name in old:
+                array[:self.count] = old[name][:self.count]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def spawn(self, x, y, vx, vy, owner, split=0, t=0.0, left_owner=False):
+        # Add one projectile; returns its index
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        i = self.count
+        self.x0[i], self.y0[i], self.vx[i], self.vy[i] = x, y, vx, vy
+        self.t[i] = t
+        self.x[i], self.y[i] = x, y
+        self.owner[i] = owner
+        self.split[i] = min(split, MAX_SPLIT)
+        self.alive[i] = True
+        self.left_owner[i] = left_owner
+        self.count += 1
+        return i
+
+    def launch(self, player_num, angle, velocity, split=0):
+        # A throw by player_num, exactly as trace_shot would start it
+        start_x, start_y, init_xvel, init_yvel = self.match.shot_start(player_num, angle,
+                                                                      velocity)
+        return self.spawn(start_x, start_y, init_xvel, init_yvel, player_num, split)
+
+    def active(self):
+        return bool(self.alive[:self.count].any())
+
+    def in_flight(self):
+        # (x, y, t) of the projectiles still flying, for drawing
+        alive = self.alive[:self.count]
+        return self.x[:self.count][alive], self.y[:self.count][alive], self.t[:self.count][alive]
+
+    def step(self):
+        # Advance every live projectile by one time step and resolve its collisions.
+        # Returns the impacts of this step as (index, impact, x, y, gorilla) tuples, with
+        # impact 'building' or 'gorilla'; buildings are carved and hit gorillas knocked out.
+        match = self.match
+        n = self.count
+        live = np.flatnonzero(self.alive[:n])
+        self.steps += 1
+        if not len(live):
+            return []
+
+        t = self.t[live]
+        x = self.x0[live] + (self.vx[live] * t) + (0.5 * (match.wind / 5) * t * t)
+        y = self.y0[live] + ((-self.vy[live] * t) + (0.5 * match.gravity * t * t)) * (
+            SCREEN_HEIGHT / 350)
+        self.x[live] = x
+        self.y[live] = y
+        self.t[live] = t + SHOT_DT
+
+        # Off the world (or flying too long): gone without an impact
+        gone = ((x < -WORLD_MARGIN_X) | (x > match.world_width + WORLD_MARGIN_X) |
+                (y > SCREEN_HEIGHT + WORLD_MARGIN_Y) | (t > MAX_SHOT_T))
+        self.alive[live[gone]] = False
+        live, x, y = live[~gone], x[~gone], y[~gone]
+
+        ix = x.astype(np.int64)
+        iy = y.astype(np.int64)
+        gorilla_x = np.array(match.gorilla_x)
+        gorilla_y = np.array(match.gorilla_y)
+        owner = self.owner[live]
+
+        # Thrower's own box: a banana may hit its thrower only after leaving it once
+        ox = gorilla_x[owner]
+        oy = gorilla_y[owner]
+        outside = ~((ox <= ix) & (ix <= ox + GORILLA_SIZE) & (oy <= iy) & (iy <= oy + GORILLA_SIZE))
+        self.left_owner[live] |= outside
+        left_owner = self.left_owner[live]
+
+        inside = (ix >= 0) & (ix < match.world_width) & (iy >= 0) & (iy < SCREEN_HEIGHT)
+        hit = np.full(len(live), -1, dtype=np.int64)
+
+        # Gorillas, lowest index first like check_collision: box test, then the pose mask
+        for i in range(match.num_players):
+            if not match.gorilla_alive[i]:
+                continue
+            dx = ix - gorilla_x[i]
+            dy = iy - gorilla_y[i]
+            candidate = (inside & (hit < 0) & ((owner != i) | left_owner) &
+                         (dx >= 0) & (dx < GORILLA_SIZE) & (dy >= 0) & (dy < GORILLA_SIZE))
+            if not candidate.any():
+                continue
+            idx = np.flatnonzero(candidate)
+            mask = self.masks[match.gorilla_pose[i]]
+            idx = idx[mask[dx[idx] * GORILLA_SIZE + dy[idx]]]
+            hit[idx] = i
+
+        # Buildings, pixel-accurate against the city mask
+        building = inside & (hit < 0)
+        if not building.any():
+            pass
+        elif match.world is not None:
+            idx = np.flatnonzero(building)
+            building[idx] = match.world.solid_many(ix[idx], iy[idx])
+        elif match.city_mask is not None:
+            idx = np.flatnonzero(building)
+            building[idx] = match.city_mask[ix[idx], iy[idx]]
+        else:
+            building[:] = False
+
+        # The sun only changes its face; the banana flies on
+        sun = inside & (hit < 0) & ~building
+        sun_x = match.world_width // 2
+        if sun.any() and ((ix[sun] - sun_x) ** 2 + (iy[sun] - SUN_Y) ** 2 <
+                          SUN_RADIUS * SUN_RADIUS).any():
+            match.sun_hit = True
+
+        impacts = []
+        for k in np.flatnonzero((hit >= 0) | building):
+            index = int(live[k])
+            self.alive[index] = False
+            if hit[k] >= 0:
+                gorilla = int(hit[k])
+                # Several fragments can land on one gorilla in the same step
+                if match.gorilla_alive[gorilla]:
+                    match.gorilla_alive[gorilla] = False
+                    self.hits.append(gorilla)
+                impacts.append((index, 'gorilla', float(x[k]), float(y[k]), gorilla))
+            else:
+                carved = match.carve_city(int(ix[k]), int(iy[k]))
+                if carved is not None and match.debris:
+                    match.settle_debris(carved[0], carved[1])
+                impacts.append((index, 'building', float(x[k]), float(y[k]), None))
+
+        self._burst(live[~(hit >= 0) & ~building])
+        return impacts
+
+    def _burst(self, live):
+        # Split the cluster bananas that have reached the top of their flight. Fragments
+        # leave from the burst point with the banana's speed, fanned out around its heading.
+        match = self.match
+        bursting = live[self.split[live] > 0]
+        if not len(bursting):
+            return
+        t = self.t[bursting] - SHOT_DT  # time of the position just resolved
+        rising = self.vy[bursting] - match.gravity * t
+        for k in np.flatnonzero(rising <= 0):
+            i = int(bursting[k])
+            vx = self.vx[i] + (match.wind / 5) * t[k]
+            vy = float(rising[k])
+            speed = math.hypot(vx, vy)
+            heading = math.degrees(math.atan2(vy, vx))
+            count = int(self.split[i])
+            self.alive[i] = False
+            for j in range(count):
+                offset = SPLIT_SPREAD * (2 * j / (count - 1) - 1) if count > 1 else 0.0
+                rad = math.radians(heading + offset)
+                self.spawn(float(self.x[i]), float(self.y[i]), math.cos(rad) * speed,
+                           math.sin(rad) * speed, int(self.owner[i]), t=SHOT_DT,
+                           left_owner=True)
+
+
+def simulate_volley(match, player_num, angle, velocity, split=0, max_steps=None):
+    # A cluster throw without drawing or waiting (the Volley counterpart of
+    # GorillasMatch.simulate_shot). Returns the gorillas hit, in order.
+    match.mark_shot()
+    volley = Volley(match)
+    volley.launch(player_num, angle, velocity, split)
+    while volley.active():
+        if max_steps is not None and volley.steps >= max_steps:
+            break
+        volley.step()
+    return volley.hits
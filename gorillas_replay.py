@@ -0,0 +1,153 @@
+# Compact binary replays for GORILLAS_BAS.py.
+# A match is fully determined by its seed, its settings and the angle/velocity typed for
+# each throw, so that is all a replay stores (a few hundred bytes). The final scores and a
+# CRC32 of the damaged city are kept so a headless re-simulation can be verified exactly.
+#
+#   python gorillas_replay.py verify match.rpl
+#   python GORILLAS_BAS.py --replay match.rpl
+
+import struct
+
+from gorillas_core import SCREEN_WIDTH
+
+MAGIC = b'GRPL'
+VERSION = 8
+
+# magic, version, seed, gravity, points to win, number of players, cluster fragments
+# (0 = plain bananas), battlefield width, falling debris, shot count
+HEADER = struct.Struct('<4sBQdHBBH?H')
+# angle, velocity, flight steps before the throw was cancelled (NO_CUT = flew to the end)
+SHOT = struct.Struct('<ddH')
+# then the final scores (one unsigned 16-bit word per player), and the city checksum
+CITY_CRC = struct.Struct('<I')
+
+NO_CUT = 0xFFFF
+
+
+class Replay:
+    def __init__(self, seed, gravity, num_games, shots=None, scores=None, city_crc=0,
+                 num_players=2, cluster=0, world_width=SCREEN_WIDTH, debris=False):
+        self.seed = seed
+        self.gravity = gravity
+        self.num_games = num_games
+        self.num_players = num_players
+        self.cluster = cluster
+        self.world_width = world_width
+        self.debris = debris
+        self.shots = list(shots) if shots is not None else []  # (angle, velocity, cut)
+        self.scores = tuple(scores) if scores is not None else (0,) * num_players
+        self.city_crc = city_crc
+
+    def record_shot(self, angle, velocity, cut=None):
+        # cut: number of flight steps shown before the player cancelled the throw
+        self.shots.append((float(angle), float(velocity), cut))
+
+    def finish(self, scores, city_crc):
+        self.scores = tuple(scores)
+        self.city_crc = city_crc
+
+    def to_bytes(self):
+        parts = [HEADER.pack(MAGIC, VERSION, self.seed, self.gravity, self.num_games,
+                             self.num_players, self.cluster, self.world_width, self.debris,
+                             len(self.shots))]
+        for angle, velocity, cut in self.shots:
+            parts.append(SHOT.pack(angle, velocity, NO_CUT if cut is None else cut))
+        parts.append(struct.pack(f'<{len(self.scores)}H', *self.scores))
+        parts.append(CITY_CRC.pack(self.city_crc))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        (magic, version, seed, gravity, num_games, num_players, cluster, world_width, debris,
+         count) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a Gorillas replay (or unsupported version)")
+        offset = HEADER.size
+        shots = []
+        for _ in range(count):
+            angle, velocity, cut = SHOT.unpack_from(data, offset)
+            shots.append((angle, velocity, None if cut == NO_CUT else cut))
+            offset += SHOT.size
+        scores = struct.unpack_from(f'<{num_players}H', data, offset)
+        (city_crc,) = CITY_CRC.unpack_from(data, offset + 2 * num_players)
+        return cls(seed, gravity, num_games, shots, scores, city_crc, num_players, cluster,
+                   world_width, debris)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def simulate(replay, game=None):
+    # Re-run a replay headlessly with the same round/turn/scoring flow as play_game.
+    # Returns (scores, city_checksum) at the point where the recording stopped.
+    if game is None:
+        from gorillas_core import GorillasMatch
+        game = GorillasMatch()
+
+    game.gravity = replay.gravity
+    game.num_games = replay.num_games
+    game.set_num_players(replay.num_players)
+    game.cluster = replay.cluster
+    game.set_world_width(replay.world_width)
+    game.debris = replay.debris
+    game.reseed(replay.seed)
+
+    shots = iter(replay.shots)
+    current_player = 0
+    while not game.match_over():
+        game.start_round()
+        round_over = False
+        while not round_over:
+            shot = next(shots, None)
+            if shot is None:
+                return tuple(game.scores), game.city_checksum()
+            angle, velocity, cut = shot
+            hits = game.simulate_throw(current_player, angle, velocity, max_steps=cut)
+            round_over = game.award_hits(current_player, hits) is not None
+            if not round_over:
+                game.sun_hit = False
+            current_player = game.next_player(current_player, round_over)
+
+    return tuple(game.scores), game.city_checksum()
+
+
+def verify(replay, game=None):
+    # True if re-simulating the replay reproduces its scores and city damage exactly
+    scores, city_crc = simulate(replay, game)
+    return scores == replay.scores and city_crc == replay.city_crc
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Inspect and verify Gorillas replays")
+    parser.add_argument("command", choices=["info", "verify"])
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.path)
+    print(f"seed {replay.seed}  gravity {replay.gravity}  to {replay.num_games} points  "
+          f"{replay.num_players} players  "
+          f"{f'cluster x{replay.cluster}  ' if replay.cluster else ''}"
+          f"{f'{replay.world_width} px wide  ' if replay.world_width != SCREEN_WIDTH else ''}"
+          f"{'debris  ' if replay.debris else ''}{len(replay.shots)} shots  "
+          f"score {'-'.join(map(str, replay.scores))}  "
+          f"({len(replay.to_bytes())} bytes)")
+    if args.command == "verify":
+        started = time.perf_counter()
+        ok = verify(replay)
+        elapsed = time.perf_counter() - started
+        print(f"{'OK' if ok else 'MISMATCH'} in {elapsed * 1000:.1f} ms")
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
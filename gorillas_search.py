@@ -0,0 +1,214 @@
+# Exhaustive shot-space search for a Gorillas round (gorillas_core).
+# outcome_map throws every angle/velocity pair of a grid from one gorilla's position in the
+# current city and records where each banana ends up, without touching the match (a throw
+# only reads the city until its first impact). The flight and collision rules are
+# GorillasMatch.trace_shot itself, so the map agrees with simulate_shot shot for shot.
+#
+# Across several processes the round is published once in a shared memory block: a small
+# header (battlefield width, wind, gravity, the gorillas) followed by the city's solid
+# mask. Workers map the block zero-copy into a match of their own and evaluate disjoint
+# slices of the grid, returning only their compact slice of the outcome grid.
+#
+#   python gorillas_search.py --seed 7 --player 0 --processes 32 --npy outcomes.npy
+
+import argparse
+import multiprocessing
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from gorillas_core import SCREEN_HEIGHT, SCREEN_WIDTH, GorillasMatch
+
+MISS = -1      # outcome of a banana that left the battlefield
+BUILDING = -2  # ... and of one that hit a building; gorilla hits are the gorilla's index
+ANGLES = np.arange(0, 91)
+VELOCITIES = np.arange(1, 201)
+POSES = ('down', 'left', 'right')
+
+# battlefield width, gravity, wind, number of players, throwing player
+HEADER = struct.Struct('<IdhBB')
+# per player: gorilla position, alive flag, pose (index into POSES)
+PLAYER = struct.Struct('<ih?B')
+
+_worker = None  # (shared memory, match, player, angles, velocities) of a worker process
+
+
+class _SharedCity:
+    # The solidity lookups of gorillas_world.ChunkedCity over a whole-battlefield mask,
+    # so a worker can fly bananas across a wide battlefield published as one block
+    def __init__(self, mask):
+        self.mask = mask
+        self.width = mask.shape[0]
+
+    def solid(self, x, y):
+        return 0 <= x < self.width and 0 <= y < SCREEN_HEIGHT and bool(self.mask[x, y])
+
+    def solid_many(self, xs, ys):
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < SCREEN_HEIGHT)
+        result = np.zeros(len(xs), dtype=bool)
+        result[inside] = self.mask[xs[inside], ys[inside]]
+        return result
+
+
+def solid_mask(match):
+    # The whole battlefield's solid pixels as one (world_width, SCREEN_HEIGHT) array.
+    # A wide city's untouched chunks are rendered for the copy but not materialized.
+    from gorillas_world import CHUNK_WIDTH
+
+    world = match.world
+    if world is None:
+        return match.city_mask
+    mask = np.empty((world.num_chunks * CHUNK_WIDTH, SCREEN_HEIGHT), dtype=bool)
+    for index in range(world.num_chunks):
+        chunk = world.masks.get(index)
+        if chunk is None:
+            chunk = world.pristine(index) != 0
+        mask[index * CHUNK_WIDTH:(index + 1) * CHUNK_WIDTH] = chunk
+    return mask[:world.width]
+
+
+def evaluate(match, player, angles, velocities, start=0, stop=None):
+    # Throw flat grid cells start..stop (angle-major) and return their (outcomes, impact x):
+    # int8 MISS / BUILDING / gorilla index, and the x where the banana stopped (int32)
+    count = len(angles) * len(velocities)
+    stop = count if stop is None else stop
+    outcomes = np.empty(stop - start, dtype=np.int8)
+    impact_x = np.empty(stop - start, dtype=np.int32)
+    for k in range(start, stop):
+        angle, velocity = divmod(k, len(velocities))
+        outcome, x = MISS, 0
+        for t, x, y, coll_type, coll_data in match.trace_shot(
+                player, float(angles[angle]), float(velocities[velocity])):
+            if coll_type == 'building':
+                outcome = BUILDING
+                break
+            if coll_type == 'gorilla':
+                outcome = coll_data
+                break
+        outcomes[k - start] = outcome
+        impact_x[k - start] = int(x)
+    return outcomes, impact_x
+
+
+def publish(match, player):
+    # Copy the round into a new shared memory block; the caller closes and unlinks it
+    mask = solid_mask(match)
+    n = match.num_players
+    offset = HEADER.size + n * PLAYER.size
+    shm = shared_memory.SharedMemory(create=True, size=offset + mask.size)
+    HEADER.pack_into(shm.buf, 0, match.world_width, match.gravity, match.wind, n, player)
+    for i in range(n):
+        PLAYER.pack_into(shm.buf, HEADER.size + i * PLAYER.size, match.gorilla_x[i],
+                         match.gorilla_y[i], match.gorilla_alive[i],
+                         POSES.index(match.gorilla_pose[i]))
+    np.ndarray(mask.shape, dtype=bool, buffer=shm.buf, offset=offset)[:] = mask
+    return shm
+
+
+def attach(name):
+    # A match reading the round published under `name` (the city mask is not copied).
+    # Returns (shared memory, match, throwing player); keep the block open while in use.
+    shm = shared_memory.SharedMemory(name=name)
+    width, gravity, wind, n, player = HEADER.unpack_from(shm.buf, 0)
+    match = GorillasMatch(num_players=n)
+    match.set_world_width(width)
+    match.gravity = gravity
+    match.wind = wind
+    for i in range(n):
+        x, y, alive, pose = PLAYER.unpack_from(shm.buf, HEADER.size + i * PLAYER.size)
+        match.gorilla_x[i], match.gorilla_y[i] = x, y
+        match.gorilla_alive[i] = alive
+        match.gorilla_pose[i] = POSES[pose]
+    match.index_gorillas()
+    mask = np.ndarray((width, SCREEN_HEIGHT), dtype=bool, buffer=shm.buf,
+                      offset=HEADER.size + n * PLAYER.size)
+    if width > SCREEN_WIDTH:
+        match.world = _SharedCity(mask)
+    else:
+        match.city_mask = mask
+    return shm, match, player
+
+
+def _init_worker(name, angles, velocities):
+    global _worker
+    shm, match, player = attach(name)
+    _worker = (shm, match, player, angles, velocities)
+
+
+def _evaluate_slice(bounds):
+    shm, match, player, angles, velocities = _worker
+    outcomes, impact_x = evaluate(match, player, angles, velocities, *bounds)
+    return bounds[0], outcomes, impact_x
+
+
+def outcome_map(match, player, angles=ANGLES, velocities=VELOCITIES, processes=None,
+                chunksize=None):
+    # Outcome of every (angle, velocity) throw by `player` in the match as it stands.
+    # Returns (outcomes, impact_x), both shaped (len(angles), len(velocities)).
+    angles = np.asarray(angles, dtype=np.float64)
+    velocities = np.asarray(velocities, dtype=np.float64)
+    shape = (len(angles), len(velocities))
+    count = shape[0] * shape[1]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        outcomes, impact_x = evaluate(match, player, angles, velocities)
+        return outcomes.reshape(shape), impact_x.reshape(shape)
+
+    if chunksize is None:
+        chunksize = max(1, count // (processes * 8))
+    slices = [(start, min(start + chunksize, count)) for start in range(0, count, chunksize)]
+    outcomes = np.empty(count, dtype=np.int8)
+    impact_x = np.empty(count, dtype=np.int32)
+    shm = publish(match, player)
+    try:
+        # Fresh interpreters, as in gorillas_tournament; each attaches the block once
+        ctx = multiprocessing.get_context("spawn")
+        pool = ctx.Pool(processes, initializer=_init_worker,
+                        initargs=(shm.name, angles, velocities))
+        try:
+            for start, part, part_x in pool.imap_unordered(_evaluate_slice, slices):
+                outcomes[start:start + len(part)] = part
+                impact_x[start:start + len(part)] = part_x
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        shm.close()
+        shm.unlink()
+    return outcomes.reshape(shape), impact_x.reshape(shape)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Outcome map of every throw in a round")
+    parser.add_argument("--seed", type=int, default=0, help="match seed of the round")
+    parser.add_argument("--player", type=int, default=0, help="throwing gorilla")
+    parser.add_argument("--players", type=int, default=2, help="gorillas in the match (2-8)")
+    parser.add_argument("--screens", type=int, default=1, help="battlefield width in screens")
+    parser.add_argument("--velocities", type=int, nargs=2, default=(1, 200),
+                        metavar=("LOW", "HIGH"), help="integer velocities to try")
+    parser.add_argument("--processes", type=int, default=None, help="default: all cores")
+    parser.add_argument("--npy", default=None, help="write the outcome grid here")
+    args = parser.parse_args(argv)
+
+    match = GorillasMatch(args.seed, args.players)
+    match.set_world_width(args.screens * SCREEN_WIDTH)
+    match.start_round()
+    velocities = np.arange(args.velocities[0], args.velocities[1] + 1)
+
+    started = time.perf_counter()
+    outcomes, impact_x = outcome_map(match, args.player, ANGLES, velocities, args.processes)
+    elapsed = time.perf_counter() - started
+
+    print(f"{outcomes.size} throws in {elapsed:.2f}s ({outcomes.size / elapsed:.0f} throws/s)")
+    print(f"Misses: {(outcomes == MISS).sum()}  Buildings: {(outcomes == BUILDING).sum()}")
+    for i in range(args.players):
+        print(f"Gorilla {i + 1} hit by {(outcomes == i).sum()} throws")
+    if args.npy:
+        np.save(args.npy, outcomes)
+
+
+if __name__ == "__main__":
+    main()
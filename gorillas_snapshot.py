@@ -0,0 +1,166 @@
+# Save/resume snapshots of an in-progress Gorillas match (GORILLAS_BAS.py or gorillas_core).
+# A snapshot holds everything play_game needs to carry on from the start of a turn:
+# settings, names, scores, whose turn it is, wind, gorilla positions, the match RNG
+# state, the replay so far and the city. The city is stored as its building records
+# plus a bit-packed mask of destroyed pixels (and, once debris has fallen, of the pixels it
+# landed on with their colors), not a full RGBA surface, followed by the round's damage log
+# (gorillas_damage) so the restored city keeps its history. The whole body is
+# zlib-compressed, so a snapshot is a few KB and restores in milliseconds.
+#
+#   python GORILLAS_BAS.py --autosave match.sav
+#   python GORILLAS_BAS.py --resume match.sav --autosave match.sav
+
+import os
+import struct
+import threading
+import zlib
+
+MAGIC = b'GSNP'
+VERSION = 9
+
+# magic, version, then the compressed body
+HEADER = struct.Struct('<4sB')
+# seed, gravity, points to win, number of players, cluster fragments, battlefield width,
+# falling debris, current player, wind, sun hit
+STATE = struct.Struct('<QdHBBH?BhB')
+# per player: score, alive flag, gorilla position
+PLAYER = struct.Struct('<HBih')
+# Mersenne Twister state: 624 words + index, and whether a gauss value is cached
+RNG_STATE = struct.Struct('<625I?d')
+
+
+def _pack_blob(data):
+    return struct.pack('<I', len(data)) + data
+
+
+def _unpack_blob(data, offset):
+    (size,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    return data[offset:offset + size], offset + size
+
+
+def take_snapshot(game):
+    # Serialize the game at the start of a turn
+    rng_version, words, gauss_next = game.rng.getstate()
+    buildings, damage, moved = game.city_state()
+    players = range(game.num_players)
+    body = b''.join([
+        STATE.pack(game.seed, game.gravity, game.num_games, game.num_players, game.cluster,
+                   game.world_width, game.debris, game.current_player, game.wind, game.sun_hit),
+        *(PLAYER.pack(game.scores[i], game.gorilla_alive[i],
+                      game.gorilla_x[i], game.gorilla_y[i]) for i in players),
+        RNG_STATE.pack(*words, gauss_next is not None, gauss_next or 0.0),
+        *(_pack_blob(game.player_names[i].encode('utf-8')) for i in players),
+        _pack_blob(buildings),
+        _pack_blob(damage),
+        _pack_blob(moved),
+        _pack_blob(game.damage_log.to_bytes() if game.damage_log is not None else b''),
+        _pack_blob(game.replay.to_bytes() if game.replay is not None else b''),
+    ])
+    return HEADER.pack(MAGIC, VERSION) + zlib.compress(body, 6)
+
+
+def restore_snapshot(game, data):
+    # Load a snapshot into a match (QBasicGorillas.play_game(resume=True) then continues it)
+    from gorillas_replay import Replay
+
+    magic, version = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a Gorillas snapshot (or unsupported version)")
+    body = zlib.decompress(data[HEADER.size:])
+
+    (seed, gravity, num_games, num_players, cluster, world_width, debris, current_player, wind,
+     sun_hit) = STATE.unpack_from(body, 0)
+    offset = STATE.size
+    players = []
+    for _ in range(num_players):
+        players.append(PLAYER.unpack_from(body, offset))
+        offset += PLAYER.size
+    rng_state = RNG_STATE.unpack_from(body, offset)
+    offset += RNG_STATE.size
+    names = []
+    for _ in range(num_players):
+        name, offset = _unpack_blob(body, offset)
+        names.append(name.decode('utf-8'))
+    buildings, offset = _unpack_blob(body, offset)
+    damage, offset = _unpack_blob(body, offset)
+    moved, offset = _unpack_blob(body, offset)
+    log, offset = _unpack_blob(body, offset)
+    replay, offset = _unpack_blob(body, offset)
+
+    game.reseed(seed)
+    game.rng.setstate((3, tuple(rng_state[:625]), rng_state[626] if rng_state[625] else None))
+    game.gravity = gravity
+    game.num_games = num_games
+    game.set_num_players(num_players)
+    game.cluster = cluster
+    game.set_world_width(world_width)
+    game.debris = debris
+    game.scores = [p[0] for p in players]
+    game.gorilla_alive = [bool(p[1]) for p in players]
+    game.gorilla_x = [p[2] for p in players]
+    game.gorilla_y = [p[3] for p in players]
+    game.index_gorillas()
+    game.current_player = current_player
+    game.wind = wind
+    game.sun_hit = bool(sun_hit)
+    game.player_names = names
+    game.load_city_state(buildings, damage, moved, log)
+    game.replay = Replay.from_bytes(replay) if replay else None
+
+
+def write_snapshot(path, data):
+    # Atomic write: a crash mid-save leaves the previous snapshot intact
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load_snapshot(game, path):
+    with open(path, 'rb') as f:
+        restore_snapshot(game, f.read())
+
+
+class AutoSaver:
+    # Writes snapshots on a background thread so autosaving never stalls a frame.
+    # Only the newest pending snapshot is written if saves arrive faster than the disk.
+    # A failed write is kept in `error` (cleared by the next one that succeeds) rather
+    # than stopping the saver, so a full disk or a bad path never ends the match.
+    def __init__(self, path):
+        self.path = path
+        self.pending = None
+        self.busy = False
+        self.error = None
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, data):
+        with self.cond:
+            self.pending = data
+            self.cond.notify_all()
+
+    def flush(self):
+        # Block until everything submitted so far is written (or has failed to be)
+        with self.cond:
+            while (self.pending is not None or self.busy) and self.thread.is_alive():
+                self.cond.wait(0.1)
+        return self.error
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None:
+                    self.cond.wait()
+                data, self.pending = self.pending, None
+                self.busy = True
+            try:
+                write_snapshot(self.path, data)
+                error = None
+            except OSError as e:
+                error = e
+            with self.cond:
+                self.error = error
+                self.busy = False
+                self.cond.notify_all()
@@ -0,0 +1,338 @@
+# Live spectators for networked Gorillas matches (gorillas_net.GorillasServer).
+# The server publishes the same compact event stream its players get: a snapshot of the
+# match at the start of each turn (seed, RNG state, scores, damaged city; a few KB), then
+# one small event per throw with its angle/velocity, impact and the scores. Viewers replay
+# every throw on their own match and draw it with the existing rendering code, so each
+# extra viewer costs the server one pre-encoded frame per event and nothing else.
+#
+# Every viewer has a bounded outgoing buffer. A viewer that falls behind has its backlog
+# thrown away and is caught up from the latest snapshot instead; one that keeps falling
+# behind is disconnected. Late joiners sync the same way.
+#
+#   python gorillas_net.py serve --spectators 5152      # match server with a viewer port
+#   python GORILLAS_BAS.py --watch localhost:5152       # watch it
+#   python gorillas_spectate.py selftest --viewers 200  # loopback match with many viewers
+
+import asyncio
+import queue
+import struct
+import threading
+
+from gorillas_core import GorillasMatch
+from gorillas_net import LENGTH, OVER, OVER_BODY, DesyncError, ProtocolError, read_msg
+from gorillas_snapshot import restore_snapshot
+
+DEFAULT_PORT = 5152
+BUFFER_FRAMES = 32  # frames queued per viewer before it counts as lagging
+MAX_RESYNCS = 3     # catch-ups a viewer gets before it is dropped
+ACCEPT_BACKLOG = 1024  # viewers tend to arrive all at once when a match is announced
+
+SYNC = b'Y'   # snapshot of the match at the start of a turn (gorillas_snapshot format)
+EVENT = b'E'  # thrower, angle, velocity, hit gorilla (-1 none), impact, x, y, scores, digest
+# OVER (final scores) is shared with the player protocol
+
+EVENT_BODY = struct.Struct('<BddbBiiHHI')
+IMPACTS = ('miss', 'building', 'gorilla')
+
+
+def _frame(kind, body):
+    return LENGTH.pack(len(body) + 1) + kind + body
+
+
+class _Viewer:
+    def __init__(self, writer, buffer_frames):
+        self.writer = writer
+        self.frames = asyncio.Queue(buffer_frames)
+        self.synced = False
+        self.resyncs = 0
+
+
+class SpectatorHub:
+    # Fans the match event stream out to any number of viewers. sync/publish_* are plain
+    # calls meant to be made from the server's event loop; they only queue frames.
+    def __init__(self, buffer_frames=BUFFER_FRAMES, max_resyncs=MAX_RESYNCS):
+        self.buffer_frames = buffer_frames
+        self.max_resyncs = max_resyncs
+        self.viewers = set()
+        self.sync_frame = None
+        self.backlog = []  # frames published since the latest snapshot
+        self.server = None
+        self.tasks = set()
+        self.resynced = 0
+        self.dropped = 0
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.server = await asyncio.start_server(self._on_connect, host, port,
+                                                 backlog=ACCEPT_BACKLOG)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        # Stop accepting viewers, let the connected ones flush what they have, then hang up
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for viewer in list(self.viewers):
+            self._hang_up(viewer)
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def _on_connect(self, reader, writer):
+        viewer = _Viewer(writer, self.buffer_frames)
+        self.viewers.add(viewer)
+        self.tasks.add(asyncio.current_task())
+        if self.sync_frame is not None and not self._catch_up(viewer):
+            self._drop(viewer)
+        try:
+            await self._pump(viewer)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.viewers.discard(viewer)
+            self.tasks.discard(asyncio.current_task())
+            writer.close()
+
+    async def _pump(self, viewer):
+        # Write queued frames, batching whatever has piled up into a single write
+        frames = viewer.frames
+        while True:
+            frame = await frames.get()
+            if frame is None:
+                return
+            parts = [frame]
+            while not frames.empty():
+                frame = frames.get_nowait()
+                if frame is None:
+                    viewer.writer.write(b''.join(parts))
+                    await viewer.writer.drain()
+                    return
+                parts.append(frame)
+            viewer.writer.write(b''.join(parts))
+            await viewer.writer.drain()
+
+    def _clear(self, viewer):
+        frames = viewer.frames
+        while not frames.empty():
+            frames.get_nowait()
+
+    def _catch_up(self, viewer):
+        # Replace whatever the viewer still had queued with the latest snapshot + backlog.
+        # False if even that does not fit its buffer.
+        self._clear(viewer)
+        frames = [self.sync_frame] + self.backlog
+        if len(frames) > self.buffer_frames:
+            return False
+        for frame in frames:
+            viewer.frames.put_nowait(frame)
+        viewer.synced = True
+        return True
+
+    def _drop(self, viewer):
+        self.dropped += 1
+        self._clear(viewer)
+        self._hang_up(viewer)
+
+    def _hang_up(self, viewer):
+        self.viewers.discard(viewer)
+        try:
+            viewer.frames.put_nowait(None)
+        except asyncio.QueueFull:
+            self._clear(viewer)
+            viewer.frames.put_nowait(None)
+
+    def sync(self, snapshot):
+        # New turn: later joiners and lagging viewers start from this snapshot
+        self.sync_frame = _frame(SYNC, snapshot)
+        self.backlog = []
+        for viewer in list(self.viewers):
+            if not viewer.synced and not self._catch_up(viewer):
+                self._drop(viewer)
+
+    def publish(self, kind, body):
+        frame = _frame(kind, body)
+        self.backlog.append(frame)
+        for viewer in list(self.viewers):
+            if not viewer.synced:
+                continue
+            try:
+                viewer.frames.put_nowait(frame)
+            except asyncio.QueueFull:
+                viewer.resyncs += 1
+                if viewer.resyncs > self.max_resyncs or not self._catch_up(viewer):
+                    self._drop(viewer)
+                else:
+                    self.resynced += 1
+
+    def publish_shot(self, player, angle, velocity, hit_player, impact, x, y, scores, city_crc):
+        self.publish(EVENT, EVENT_BODY.pack(
+            player, angle, velocity, -1 if hit_player is None else hit_player,
+            IMPACTS.index(impact), int(x or 0), int(y or 0), scores[0], scores[1], city_crc))
+
+    def publish_over(self, scores):
+        self.publish(OVER, OVER_BODY.pack(*scores))
+
+
+class SpectatorClient:
+    # Follows a match from the spectator stream, keeping its own GorillasMatch in step.
+    # Subclasses (or a frontend) react through the on_* hooks.
+    def __init__(self, match=None):
+        self.match = match
+        self.reader = None
+        self.writer = None
+        self.syncs = 0
+
+    async def connect(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    async def run(self):
+        # Follow the match until it is over; returns the final scores
+        while True:
+            kind, body = await read_msg(self.reader)
+            if kind == SYNC:
+                if self.match is None:
+                    self.match = GorillasMatch()
+                restore_snapshot(self.match, body)
+                self.syncs += 1
+                self.on_sync(body)
+            elif kind == EVENT:
+                self.apply_event(*EVENT_BODY.unpack(body))
+            elif kind == OVER:
+                scores = OVER_BODY.unpack(body)
+                self.on_over(scores)
+                return scores
+            else:
+                raise ProtocolError(f"unexpected message {kind!r}")
+
+    def apply_event(self, player, angle, velocity, hit, impact, x, y, score0, score1, city_crc):
+        # Same bookkeeping as GorillasClient.apply_result
+        match = self.match
+        if match is None or player != match.current_player:
+            raise DesyncError("event for a turn this viewer has not seen")
+        hit_player, impact, x, y = match.simulate_shot(player, angle, velocity)
+        if hit_player is not None:
+            match.award_point(player, hit_player)
+        if match.replay is not None:
+            match.replay.record_shot(angle, velocity)
+        match.sun_hit = False
+        match.current_player = 1 - player
+        if ((-1 if hit_player is None else hit_player) != hit or
+                list(match.scores) != [score0, score1] or match.city_digest() != city_crc):
+            raise DesyncError("local simulation no longer matches the server")
+        self.on_event(player, angle, velocity, hit_player, x, y)
+        if hit_player is not None and max(match.scores) < match.num_games:
+            match.start_round()
+
+    def on_sync(self, snapshot):
+        pass
+
+    def on_event(self, player, angle, velocity, hit_player, x, y):
+        pass
+
+    def on_over(self, scores):
+        pass
+
+
+class SpectatorSession:
+    # Bridges a pygame frontend to the stream: the raw snapshots and throws are handed to
+    # the game loop through a queue, which animates them itself
+    def __init__(self, host, port):
+        self.events = queue.Queue()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, args=(host, port), daemon=True)
+        self.thread.start()
+
+    def _run(self, host, port):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._follow(host, port))
+
+    async def _follow(self, host, port):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError as exc:
+            self.events.put(('error', exc))
+            return
+        try:
+            while True:
+                kind, body = await read_msg(reader)
+                if kind == SYNC:
+                    self.events.put(('sync', body))
+                elif kind == EVENT:
+                    player, angle, velocity = EVENT_BODY.unpack(body)[:3]
+                    self.events.put(('shot', (player, angle, velocity)))
+                elif kind == OVER:
+                    self.events.put(('over', OVER_BODY.unpack(body)))
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError) as exc:
+            self.events.put(('error', exc))
+        finally:
+            writer.close()
+
+
+async def run_watched_match(seed=0, viewers=100, late=0.5, turn_delay=0.0):
+    # Loopback match with scripted players and many viewers, some joining part-way through.
+    # Returns (server match, hub, viewer clients).
+    from gorillas_net import GorillasServer, ScriptedClient
+
+    hub = SpectatorHub()
+    spectator_port = await hub.start('127.0.0.1', 0)
+    server = GorillasServer(seed, spectators=hub)
+    port = await server.start('127.0.0.1', 0)
+    players = [ScriptedClient("Alice", seed=1, delay=turn_delay),
+               ScriptedClient("Bob", seed=2, delay=turn_delay)]
+    watchers = [SpectatorClient() for _ in range(viewers)]
+    early = watchers[:int(viewers * (1 - late))]
+
+    async def watch(client, wait):
+        await asyncio.sleep(wait)
+        await client.connect('127.0.0.1', spectator_port)
+        return await client.run()
+
+    try:
+        for client in early:
+            await client.connect('127.0.0.1', spectator_port)
+        for client in players:
+            await client.connect('127.0.0.1', port)
+            while len(server.players) < players.index(client) + 1:
+                await asyncio.sleep(0)
+        late_watches = [watch(client, turn_delay * (i % 8)) for i, client in
+                        enumerate(watchers[len(early):])]
+        await asyncio.gather(server.serve_match(), *(client.run() for client in players),
+                             *(client.run() for client in early), *late_watches)
+    finally:
+        for client in players + watchers:
+            await client.close()
+        await server.close()
+        await hub.close()
+    return server.match, hub, watchers
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Gorillas spectator stream")
+    sub = parser.add_subparsers(dest="command", required=True)
+    selftest = sub.add_parser("selftest", help="loopback match watched by many viewers")
+    selftest.add_argument("--seed", type=int, default=0)
+    selftest.add_argument("--viewers", type=int, default=200)
+    selftest.add_argument("--turn-delay", type=float, default=0.02,
+                          help="seconds each scripted player thinks before throwing")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    match, hub, watchers = asyncio.run(run_watched_match(args.seed, args.viewers,
+                                                         turn_delay=args.turn_delay))
+    elapsed = time.perf_counter() - started
+    in_sync = sum(w.match is not None and w.match.city_checksum() == match.city_checksum() and
+                  w.match.scores == match.scores for w in watchers)
+    print(f"Match finished {match.scores[0]}-{match.scores[1]} in {elapsed:.2f}s; "
+          f"{in_sync}/{len(watchers)} viewers in sync "
+          f"({hub.resynced} caught up, {hub.dropped} dropped)")
+    return 0 if in_sync == len(watchers) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
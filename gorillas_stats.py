@@ -0,0 +1,157 @@
+# Columnar statistics of played matches, for offline analysis with NumPy.
+# A stats log is a directory holding one table per kind of record (rounds/, shots/). Every
+# column of a table is a raw little-endian file of fixed-size values (<column>.bin), and
+# schema.json names the columns and their dtypes. Rows are buffered in memory and appended
+# in batches, so logging a throw costs a tuple store; the files can be memory-mapped
+# without parsing anything, and reopening a log appends to it.
+#
+#   python GORILLAS_BAS.py --stats stats/
+#
+#   tables = load_stats('stats/')
+#   shots = tables['shots']
+#   hit_rate = (shots['impact'] == IMPACTS.index('gorilla')).mean()
+#   windy = tables['rounds']['wind'][shots['round']]   # per-shot wind via the round index
+
+import json
+import os
+
+import numpy as np
+
+FORMAT = 1
+BATCH_ROWS = 4096
+IMPACTS = ('miss', 'building', 'gorilla', 'cut')
+
+TABLES = {
+    # One row per round: the match seed and the round's number in it, then its settings
+    # and a summary of the skyline
+    'rounds': [
+        ('seed', '<u8'), ('round', '<u2'), ('wind', '<i2'), ('gravity', '<f8'),
+        ('players', 'u1'), ('cluster', 'u1'), ('debris', '?'), ('world_width', '<u4'),
+        ('buildings', '<u2'), ('mean_height', '<f4'), ('min_height', '<i2'),
+        ('max_height', '<i2'),
+    ],
+    # One row per throw: its round (row in rounds), turn in the round, the throw, and how
+    # it ended. hit is the first gorilla hit (-1 none); x, y is where the banana stopped.
+    'shots': [
+        ('round', '<u4'), ('turn', '<u4'), ('player', 'u1'), ('angle', '<f4'),
+        ('velocity', '<f4'), ('flight_time', '<f4'), ('impact', 'u1'), ('x', '<f4'),
+        ('y', '<f4'), ('hit', 'i1'), ('sun_hit', '?'),
+    ],
+}
+
+
+def _schema():
+    return {'format': FORMAT,
+            'tables': {name: [[column, dtype] for column, dtype in columns]
+                       for name, columns in TABLES.items()}}
+
+
+def _rows_on_disk(directory, columns):
+    # Complete rows in a table's files (a run that died mid-flush may have left one column
+    # longer than the others)
+    rows = None
+    for column, dtype in columns:
+        path = os.path.join(directory, column + '.bin')
+        count = os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+        rows = count if rows is None else min(rows, count)
+    return rows or 0
+
+
+class ColumnTable:
+    # Append-only table of fixed-size columns, buffered BATCH_ROWS rows at a time
+    def __init__(self, directory, columns, batch=BATCH_ROWS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.columns = columns
+        self.buffer = np.zeros(batch, dtype=np.dtype(columns))
+        self.pending = 0
+        self.written = _rows_on_disk(directory, columns)
+        # Drop the tail of a torn batch so every column starts the next one aligned
+        for column, dtype in columns:
+            path = os.path.join(directory, column + '.bin')
+            with open(path, 'ab') as f:
+                f.truncate(self.written * np.dtype(dtype).itemsize)
+
+    def __len__(self):
+        return self.written + self.pending
+
+    def append(self, row):
+        # row: a tuple in column order; returns its row number
+        self.buffer[self.pending] = row
+        self.pending += 1
+        if self.pending == len(self.buffer):
+            self.flush()
+        return len(self) - 1
+
+    def flush(self):
+        if not self.pending:
+            return
+        for column, _ in self.columns:
+            with open(os.path.join(self.directory, column + '.bin'), 'ab') as f:
+                f.write(self.buffer[column][:self.pending].tobytes())
+        self.written += self.pending
+        self.pending = 0
+
+
+class StatsLog:
+    def __init__(self, path, batch=BATCH_ROWS):
+        os.makedirs(path, exist_ok=True)
+        schema_path = os.path.join(path, 'schema.json')
+        if os.path.exists(schema_path):
+            with open(schema_path) as f:
+                if json.load(f) != _schema():
+                    raise ValueError(f"{path} holds stats in a different format")
+        else:
+            with open(schema_path, 'w') as f:
+                json.dump(_schema(), f, indent=1)
+        self.tables = {name: ColumnTable(os.path.join(path, name), columns, batch)
+                       for name, columns in TABLES.items()}
+        self.round = None  # row of the round being played
+        self.turn = 0
+
+    def log_round(self, match):
+        # A round starts (call after start_round)
+        heights = np.asarray(match.buildings['height'])
+        self.round = self.tables['rounds'].append((
+            match.seed, sum(match.scores), match.wind, match.gravity, match.num_players,
+            match.cluster, match.debris, match.world_width, len(heights),
+            heights.mean(), heights.min(), heights.max()))
+        self.turn = 0
+
+    def log_shot(self, player, angle, velocity, end, hits, sun_hit):
+        # A throw of the current round has ended. end: (impact, flight time, x, y) with
+        # impact one of IMPACTS (x, y None if unknown); hits: the gorillas it hit.
+        # Throws of a round that started before logging did (a resumed one) are skipped.
+        if self.round is None:
+            return
+        impact, flight_time, x, y = end
+        self.tables['shots'].append((
+            self.round, self.turn, player, angle, velocity, flight_time, IMPACTS.index(impact),
+            np.nan if x is None else x, np.nan if y is None else y,
+            hits[0] if hits else -1, sun_hit))
+        self.turn += 1
+
+    def flush(self):
+        for table in self.tables.values():
+            table.flush()
+
+    def close(self):
+        self.flush()
+
+
+def load_stats(path):
+    # Memory-map every column of a stats log: {table: {column: read-only array}}
+    with open(os.path.join(path, 'schema.json')) as f:
+        schema = json.load(f)
+    if schema.get('format') != FORMAT:
+        raise ValueError(f"{path} holds stats in an unsupported format")
+    tables = {}
+    for name, columns in schema['tables'].items():
+        directory = os.path.join(path, name)
+        rows = _rows_on_disk(directory, columns)
+        tables[name] = {
+            column: (np.memmap(os.path.join(directory, column + '.bin'), dtype=dtype,
+                               mode='r', shape=(rows,))
+                     if rows else np.empty(0, dtype=dtype))
+            for column, dtype in columns}
+    return tables
@@ -0,0 +1,124 @@
+# Opt-in per-frame timing for GORILLAS_BAS.py.
+# Render loops wrap their stages (draw_scene, text, scale, flip, check_collision, audio
+# synthesis, ...) in frame_timer.stage(name) and mark the end of every frame. While the
+# timer is disabled, stage() hands back one shared do-nothing context manager, so the
+# instrumentation costs a method call and a flag test. When enabled, every stage becomes an
+# event (name, thread, start, duration) that can be shown as an on-screen overlay or written
+# out for chrome://tracing / Perfetto (.json) or a spreadsheet (.csv).
+#
+#   python GORILLAS_BAS.py --frame-stats              # frame-time overlay
+#   python GORILLAS_BAS.py --trace frames.json        # Chrome trace written on exit
+
+import collections
+import contextlib
+import csv
+import json
+import os
+import threading
+import time
+
+MAX_EVENTS = 500000   # the oldest events are dropped once a trace gets this long
+OVERLAY_FRAMES = 120  # frames the overlay averages over
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'started')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.record(self.name, self.started, time.perf_counter_ns() - self.started)
+        return False
+
+
+class FrameTimer:
+    def __init__(self):
+        self.enabled = False
+        self.events = collections.deque(maxlen=MAX_EVENTS)  # (frame, name, tid, start, dur)
+        self.frame = 0
+        self.frame_times = collections.deque(maxlen=OVERLAY_FRAMES)  # ns per frame
+        self.frame_started = None
+        self.current = collections.Counter()   # ns per stage in the frame being drawn
+        self.previous = collections.Counter()  # ... and in the last finished frame
+        self.origin = time.perf_counter_ns()
+
+    def enable(self):
+        self.enabled = True
+        self.frame_started = time.perf_counter_ns()
+
+    def stage(self, name):
+        # with frame_timer.stage('draw_scene'): ...
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def wrap(self, name, func):
+        # A timed version of func, for hot calls made from code we don't want to edit
+        # (only installed when timing is on, so the plain path stays untouched)
+        def timed(*args, **kwargs):
+            started = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, started, time.perf_counter_ns() - started)
+        return timed
+
+    def record(self, name, started, duration):
+        # deque.append is atomic, so audio threads can record alongside the game loop
+        self.events.append((self.frame, name, threading.get_ident(), started, duration))
+        self.current[name] += duration
+
+    def frame_end(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        self.frame_times.append(now - self.frame_started)
+        self.frame_started = now
+        self.previous, self.current = self.current, collections.Counter()
+        self.frame += 1
+
+    def overlay_lines(self):
+        # Text for the on-screen overlay: frame time now/avg/max, then the last frame's stages
+        if not self.frame_times:
+            return []
+        times = self.frame_times
+        lines = [f"frame {times[-1] / 1e6:5.1f} ms  avg {sum(times) / len(times) / 1e6:5.1f}"
+                 f"  max {max(times) / 1e6:5.1f}"]
+        for name, duration in self.previous.most_common():
+            lines.append(f"{name:15s} {duration / 1e6:6.2f} ms")
+        return lines
+
+    def export(self, path):
+        # Format by extension: .csv, otherwise Chrome trace JSON
+        if os.path.splitext(path)[1].lower() == '.csv':
+            self.export_csv(path)
+        else:
+            self.export_chrome_trace(path)
+
+    def export_chrome_trace(self, path):
+        pid = os.getpid()
+        trace = [{'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                  'ts': (started - self.origin) / 1000, 'dur': duration / 1000,
+                  'args': {'frame': frame}}
+                 for frame, name, tid, started, duration in list(self.events)]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+    def export_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'stage', 'thread', 'start_ms', 'duration_ms'])
+            for frame, name, tid, started, duration in list(self.events):
+                writer.writerow([frame, name, tid, f"{(started - self.origin) / 1e6:.4f}",
+                                 f"{duration / 1e6:.4f}"])
+
+
+frame_timer = FrameTimer()
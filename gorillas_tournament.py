@@ -0,0 +1,232 @@
+# Headless AI-vs-AI tournament runner for the Gorillas game rules (gorillas_core).
+# Plays many complete matches across a process pool (no window, no sound) so
+# gravity/wind settings can be tuned from win rates and shot statistics.
+#
+#   python gorillas_tournament.py --matches 5000 --gravity 9.8 --json results.json
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from gorillas_core import GorillasMatch
+
+MAX_SHOTS_PER_ROUND = 200  # a round nobody can finish is scored as stalled
+MAX_ROUNDS_FACTOR = 10     # a match gives up after points * this many rounds
+
+_worker_game = None  # one match per worker process, reused across matches
+
+
+class AIPlayer:
+    # Simple bracketing aimer: keeps an angle and nudges the velocity by how far
+    # the last banana landed from the opponent (range grows with velocity squared).
+    def __init__(self, rng):
+        self.rng = rng
+        self.reset()
+
+    def reset(self):
+        self.angle = self.rng.randint(35, 70)
+        self.velocity = self.rng.uniform(40, 80)
+
+    def choose(self):
+        angle = max(1, min(89, self.angle + self.rng.gauss(0, 1.0)))
+        velocity = max(5, self.velocity + self.rng.gauss(0, 1.5))
+        return angle, velocity
+
+    def observe(self, own_x, target_x, impact_x):
+        # Distance thrown vs distance needed, both measured towards the opponent
+        direction = 1 if target_x > own_x else -1
+        needed = abs(target_x - own_x)
+        thrown = (impact_x - own_x) * direction if impact_x is not None else 0
+        if thrown <= 0:
+            self.velocity += 10
+            self.angle = min(80, self.angle + 5)
+        else:
+            ratio = max(0.5, min(2.0, needed / thrown))
+            self.velocity = max(5, min(200, self.velocity * ratio ** 0.5))
+
+
+def _init_worker():
+    global _worker_game
+    _worker_game = GorillasMatch()
+
+
+def _target(game, player):
+    # The AI aims at the nearest opponent still standing on the side it throws towards
+    # (or the nearest one at all if nobody is left on that side)
+    own_x = game.gorilla_x[player]
+    facing = game.gorilla_facing[player]
+    others = [i for i in range(game.num_players) if i != player and game.gorilla_alive[i]]
+    ahead = [i for i in others if (game.gorilla_x[i] - own_x) * facing > 0]
+    return min(ahead or others, key=lambda i: abs(game.gorilla_x[i] - own_x))
+
+
+def play_match(seed, gravity=9.8, points=3, wind=None, num_players=2):
+    # Play one complete match with the same round/turn/scoring flow as play_game.
+    # All cityscape/wind/placement randomness is driven by the per-match seed.
+    game = _worker_game
+    if game is None:
+        _init_worker()
+        game = _worker_game
+
+    game.reseed(seed)
+    ai_rng = random.Random(seed * 2 + 1)
+    players = [AIPlayer(ai_rng) for _ in range(num_players)]
+
+    game.gravity = gravity
+    game.num_games = points
+    game.set_num_players(num_players)
+
+    current_player = 0
+    shots_per_round = []
+    self_hits = 0
+    sun_hits = 0
+    stalled_rounds = 0
+    max_rounds = points * MAX_ROUNDS_FACTOR
+
+    while not game.match_over() and len(shots_per_round) < max_rounds:
+        game.start_round()
+        if wind is not None:
+            game.wind = wind
+        for ai in players:
+            ai.reset()
+
+        shots = 0
+        round_over = False
+        while not round_over and shots < MAX_SHOTS_PER_ROUND:
+            target = _target(game, current_player)
+            angle, velocity = players[current_player].choose()
+            hit_player, impact, x, y = game.simulate_shot(current_player, angle, velocity)
+            shots += 1
+
+            if hit_player is not None:
+                round_over = game.award_point(current_player, hit_player) is not None
+                if hit_player == current_player:
+                    self_hits += 1
+            else:
+                players[current_player].observe(game.gorilla_x[current_player],
+                                                game.gorilla_x[target], x)
+                if game.sun_hit:
+                    sun_hits += 1
+            if not round_over:
+                game.sun_hit = False
+            current_player = game.next_player(current_player, round_over)
+
+        if not round_over:
+            stalled_rounds += 1
+        shots_per_round.append(shots)
+
+    best = max(game.scores)
+    leaders = [i for i, score in enumerate(game.scores) if score == best]
+    winner = leaders[0] if len(leaders) == 1 else None
+
+    return {
+        'seed': seed,
+        'winner': winner,
+        'scores': list(game.scores),
+        'shots_per_round': shots_per_round,
+        'self_hits': self_hits,
+        'sun_hits': sun_hits,
+        'stalled_rounds': stalled_rounds,
+    }
+
+
+def summarize(results):
+    # Aggregate per-match results into win rates and per-round shot statistics
+    matches = len(results)
+    wins = [0] * (len(results[0]['scores']) if results else 2)
+    draws = 0
+    rounds = 0
+    shots = 0
+    self_hits = 0
+    sun_hits = 0
+    stalled = 0
+    for r in results:
+        if r['winner'] is None:
+            draws += 1
+        else:
+            wins[r['winner']] += 1
+        rounds += len(r['shots_per_round'])
+        shots += sum(r['shots_per_round'])
+        self_hits += r['self_hits']
+        sun_hits += r['sun_hits']
+        stalled += r['stalled_rounds']
+
+    decided = rounds - stalled
+    return {
+        'matches': matches,
+        'win_rate': [w / matches if matches else 0.0 for w in wins],
+        'draws': draws,
+        'rounds': rounds,
+        'shots': shots,
+        'shots_per_round': shots / rounds if rounds else 0.0,
+        'self_hit_rate': self_hits / decided if decided else 0.0,
+        'sun_hits': sun_hits,
+        'stalled_rounds': stalled,
+    }
+
+
+def run_tournament(matches, processes=None, base_seed=0, gravity=9.8, points=3, wind=None,
+                   chunksize=None, num_players=2):
+    # Fan matches out over a process pool; each match is seeded with base_seed + index
+    seeds = range(base_seed, base_seed + matches)
+    processes = processes or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, matches // (processes * 8))
+    job = functools.partial(play_match, gravity=gravity, points=points, wind=wind,
+                            num_players=num_players)
+
+    if processes == 1:
+        _init_worker()
+        results = [job(seed) for seed in seeds]
+    else:
+        # Fresh interpreters so workers never inherit an importing process's SDL/audio
+        # threads; close/join lets them exit cleanly.
+        ctx = multiprocessing.get_context("spawn")
+        pool = ctx.Pool(processes, initializer=_init_worker)
+        try:
+            results = list(pool.imap_unordered(job, seeds, chunksize))
+        finally:
+            pool.close()
+            pool.join()
+
+    results.sort(key=lambda r: r['seed'])
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless AI-vs-AI Gorillas tournament")
+    parser.add_argument("--matches", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=None, help="default: all cores")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first match")
+    parser.add_argument("--gravity", type=float, default=9.8)
+    parser.add_argument("--points", type=int, default=3, help="points needed to win a match")
+    parser.add_argument("--wind", type=int, default=None, help="fixed wind instead of random")
+    parser.add_argument("--players", type=int, default=2, help="gorillas per match (2-8)")
+    parser.add_argument("--json", default=None, help="write summary and per-match results here")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results = run_tournament(args.matches, args.processes, args.seed, args.gravity,
+                             args.points, args.wind, num_players=args.players)
+    elapsed = time.perf_counter() - started
+    summary = summarize(results)
+
+    print(f"{summary['matches']} matches in {elapsed:.2f}s "
+          f"({summary['matches'] / elapsed:.1f} matches/s)")
+    rates = "  ".join(f"P{i + 1} {rate:.3f}" for i, rate in enumerate(summary['win_rate']))
+    print(f"Win rate:        {rates}  (draws {summary['draws']})")
+    print(f"Shots per round: {summary['shots_per_round']:.2f}")
+    print(f"Self-hit rate:   {summary['self_hit_rate']:.3f}")
+    print(f"Sun hits:        {summary['sun_hits']}  Stalled rounds: {summary['stalled_rounds']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'summary': summary, 'matches': results}, f)
+
+
+if __name__ == "__main__":
+    main()
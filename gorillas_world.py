@@ -0,0 +1,149 @@
+# Battlefields wider than the screen (GorillasMatch.set_world_width).
+# A wide city is kept as fixed-size chunks of CHUNK_WIDTH columns instead of one big raster.
+# A chunk is only rasterized the first time anything touches it, whether a collision test,
+# a crater or the camera drawing it. Memory and rebuild time therefore grow with the part of
+# the skyline a round actually uses, not with its total width. Collision tests, craters and
+# falling debris work on the chunks directly; a frontend redraws a chunk whenever its
+# version changes.
+
+import struct
+import zlib
+
+import numpy as np
+
+from gorillas_core import (
+    CITY_BOTTOM, SCREEN_HEIGHT, crater_disc, decode_damage, encode_damage, rasterize_city,
+    settle_columns,
+)
+
+CHUNK_WIDTH = 64
+# chunk index, then the lengths of its destroyed and moved blobs (gorillas_core.encode_damage)
+CHUNK_STATE = struct.Struct('<HII')
+
+
+class ChunkedCity:
+    def __init__(self, buildings, width):
+        self.buildings = buildings
+        self.width = width
+        self.num_chunks = -(-width // CHUNK_WIDTH)
+        self.left = buildings['x'].astype(np.int64)
+        self.right = self.left + buildings['width']
+        self.colors = {}    # chunk -> (CHUNK_WIDTH, SCREEN_HEIGHT) EGA colors
+        self.masks = {}     # chunk -> solid pixels of the same shape
+        self.versions = {}  # chunk -> bumped whenever its pixels change
+        self.damaged = set()  # chunks that differ from the pristine city
+
+    def pristine(self, index):
+        # Rasterize the buildings overlapping chunk `index` (only those) and cut the chunk out
+        x0 = index * CHUNK_WIDTH
+        x1 = x0 + CHUNK_WIDTH
+        overlap = np.flatnonzero((self.left < x1) & (self.right > x0))
+        colors = np.zeros((CHUNK_WIDTH, SCREEN_HEIGHT), dtype=np.uint8)
+        if len(overlap):
+            span0 = int(self.left[overlap[0]])
+            span1 = int(self.right[overlap[-1]])
+            local = self.buildings[overlap].copy()
+            local['x'] -= span0
+            pixels = rasterize_city(local, city_width=span1 - span0)
+            lo, hi = max(x0, span0), min(x1, span1)
+            colors[lo - x0:hi - x0] = pixels[lo - span0:hi - span0]
+        return colors
+
+    def chunk(self, index):
+        # (colors, mask) of a chunk, materialized on first use
+        mask = self.masks.get(index)
+        if mask is None:
+            colors = self.pristine(index)
+            mask = colors != 0
+            self.colors[index] = colors
+            self.masks[index] = mask
+            self.versions[index] = 0
+        return self.colors[index], mask
+
+    def solid(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < SCREEN_HEIGHT):
+            return False
+        return bool(self.chunk(x // CHUNK_WIDTH)[1][x % CHUNK_WIDTH, y])
+
+    def solid_many(self, xs, ys):
+        # solid() for arrays of integer points, one lookup per chunk they fall in
+        result = np.zeros(len(xs), dtype=bool)
+        inside = np.flatnonzero((xs >= 0) & (xs < self.width) &
+                                (ys >= 0) & (ys < SCREEN_HEIGHT))
+        if not len(inside):
+            return result
+        chunks = xs[inside] // CHUNK_WIDTH
+        for index in np.unique(chunks).tolist():
+            points = inside[chunks == index]
+            mask = self.chunk(index)[1]
+            result[points] = mask[xs[points] - index * CHUNK_WIDTH, ys[points]]
+        return result
+
+    def _touch(self, index):
+        self.versions[index] += 1
+        self.damaged.add(index)
+
+    def carve(self, x, y, radius):
+        # Same as GorillasMatch.carve_city, chunk by chunk. Returns the clipped
+        # (x0, x1, y0, y1, disc) in world pixels, or None.
+        x0, x1 = max(0, x - radius), min(self.width, x + radius + 1)
+        y0, y1 = max(0, y - radius), min(SCREEN_HEIGHT, y + radius + 1)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        disc = crater_disc(radius)[x0 - x + radius:x1 - x + radius,
+                                   y0 - y + radius:y1 - y + radius]
+        for index in range(x0 // CHUNK_WIDTH, (x1 - 1) // CHUNK_WIDTH + 1):
+            base = index * CHUNK_WIDTH
+            lo, hi = max(x0, base), min(x1, base + CHUNK_WIDTH)
+            mask = self.chunk(index)[1]
+            mask[lo - base:hi - base, y0:y1] &= ~disc[lo - x0:hi - x0]
+            self._touch(index)
+        return x0, x1, y0, y1, disc
+
+    def settle(self, x0, x1, max_steps=None):
+        # Falling debris (gorillas_core.settle_columns) in world columns x0..x1
+        bottom = SCREEN_HEIGHT - CITY_BOTTOM
+        falling = False
+        x0, x1 = max(0, x0), min(x1, self.width)
+        for index in range(x0 // CHUNK_WIDTH, (x1 - 1) // CHUNK_WIDTH + 1):
+            base = index * CHUNK_WIDTH
+            lo, hi = max(x0, base) - base, min(x1, base + CHUNK_WIDTH) - base
+            colors, mask = self.chunk(index)
+            falling |= settle_columns(mask[lo:hi, :bottom], colors[lo:hi, :bottom], max_steps)
+            self._touch(index)
+        return falling
+
+    def checksum(self):
+        # CRC32 over the damaged chunks only, so it doesn't depend on which pristine chunks
+        # happen to have been materialized
+        crc = 0
+        for index in sorted(self.damaged):
+            crc = zlib.crc32(struct.pack('<H', index), crc)
+            crc = zlib.crc32(np.packbits(self.masks[index]).tobytes(), crc)
+        return crc
+
+    def state(self):
+        # Damage of every damaged chunk against its pristine render, for snapshots
+        parts = []
+        for index in sorted(self.damaged):
+            destroyed, moved = encode_damage(self.pristine(index), self.masks[index],
+                                             self.colors[index])
+            parts += [CHUNK_STATE.pack(index, len(destroyed), len(moved)), destroyed, moved]
+        return b''.join(parts)
+
+    def load_state(self, data):
+        offset = 0
+        while offset < len(data):
+            index, destroyed_size, moved_size = CHUNK_STATE.unpack_from(data, offset)
+            offset += CHUNK_STATE.size
+            destroyed = data[offset:offset + destroyed_size]
+            offset += destroyed_size
+            moved = data[offset:offset + moved_size]
+            offset += moved_size
+            colors, mask = self.chunk(index)
+            decode_damage(mask, colors, destroyed, moved)
+            self._touch(index)
+
+    def memory(self):
+        # Bytes held by the materialized chunks
+        return sum(self.colors[i].nbytes + self.masks[i].nbytes for i in self.masks)